@@ -0,0 +1,169 @@
+"""Cold-start benchmark: how quickly a fresh worker can serve traffic
+
+Measures, each in a fresh interpreter and with stubbed API keys (no network needed):
+
+- import cost of `main`, per top-level module it pulls in (python -X importtime)
+- time from process start to the first successful GET /health (uvicorn)
+- resident memory (RSS) of the worker once /health answers
+- optionally the time to the first 200 from GET /ready (needs a reachable database)
+
+    python bench/cold_start.py --runs 5
+    python bench/cold_start.py --runs 3 --ready --json cold_start.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB_ENV = {
+    "OPENAI_API_KEY": "sk-cold-start-stub",
+    "PINECONE_API_KEY": "cold-start-stub",
+    "PYTHONDONTWRITEBYTECODE": "1",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    for key, value in STUB_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+
+def import_profile(module: str = "main") -> dict:
+    """Cumulative import time (ms) of every top-level package imported while importing `module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=bench_env(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    total = 0.0
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == module:
+            total = int(cumulative_us) / 1000
+        # Charge each module's own time to its top-level package
+        packages[name.split(".")[0]] += int(self_us) / 1000
+    packages.pop(module, None)
+    return {"total_ms": total, "packages": dict(sorted(packages.items(), key=lambda item: -item[1]))}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def wait_for(url: str, deadline: float, process) -> float:
+    """Seconds since the epoch at which `url` first answered 200, or None"""
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return None
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.time()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def boot_once(timeout: float, ready: bool) -> dict:
+    port = free_port()
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        health_at = wait_for(f"{base}/health", started + timeout, process)
+        if health_at is None:
+            stderr = process.stderr.read().decode() if process.poll() is not None else ""
+            raise RuntimeError(f"/health did not answer within {timeout}s\n{stderr[-2000:]}")
+        run = {"health_s": health_at - started, "rss_mb": rss_mb(process.pid)}
+        if ready:
+            ready_at = wait_for(f"{base}/ready", started + timeout, process)
+            run["ready_s"] = None if ready_at is None else ready_at - started
+        return run
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarize(values: list) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the pizza/bread API")
+    parser.add_argument("--runs", type=int, default=3, help="number of fresh worker boots")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each boot")
+    parser.add_argument("--ready", action="store_true", help="also wait for GET /ready (database required)")
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the import profile")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    profile = import_profile()
+    print(f"import main: {profile['total_ms']:.0f} ms")
+    for name, ms in list(profile["packages"].items())[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    runs = [boot_once(args.timeout, args.ready) for _ in range(args.runs)]
+    results = {
+        "import": profile,
+        "runs": runs,
+        "health_s": summarize([run["health_s"] for run in runs]),
+        "rss_mb": summarize([run["rss_mb"] for run in runs]),
+    }
+    if args.ready:
+        results["ready_s"] = summarize([run.get("ready_s") for run in runs])
+
+    print(f"\n{'':12}{'min':>10}{'median':>10}{'max':>10}")
+    for key, unit in (("health_s", "s"), ("ready_s", "s"), ("rss_mb", "MB")):
+        stats = results.get(key)
+        if stats:
+            print(f"{key:12}" + "".join(f"{stats[k]:>{10 - len(unit)}.2f}{unit}" for k in ("min", "median", "max")))
+        elif key in results:
+            print(f"{key:12}  never became ready within {args.timeout}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
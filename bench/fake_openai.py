@@ -0,0 +1,197 @@
+"""Offline stand-in for the OpenAI API, for load testing without paying for completions
+
+Implements POST /v1/chat/completions (plain and stream=True) and POST /v1/embeddings with
+configurable latency: time-to-first-token is drawn from a log-normal distribution and the
+completion is then produced at a (jittered) token rate. Replies that are expected to be JSON
+(the prompt mentions JSON) are valid JSON objects, everything else is plain prose.
+
+Run it, then point the app at it before starting uvicorn:
+
+    python bench/fake_openai.py --port 9100 --ttft-ms 400 --tokens-per-sec 60
+    export OPENAI_BASE_URL=http://127.0.0.1:9100/v1   # openai SDK (llm.py)
+    export OPENAI_API_BASE=http://127.0.0.1:9100/v1   # langchain-openai (ChatOpenAI, embeddings)
+    export OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI")
+
+# Latency model, overridden from the command line
+CONFIG = {
+    "ttft_ms": 400.0,          # median time to first token
+    "ttft_sigma": 0.5,         # log-normal spread of the time to first token
+    "tokens_per_sec": 60.0,    # mean generation speed
+    "rate_jitter": 0.2,        # +/- fraction applied to the token rate per request
+    "completion_tokens": 300,  # target reply length, capped by max_tokens
+    "embedding_ms": 50.0,      # median embeddings latency
+    "error_rate": 0.0,         # fraction of requests answered with 429/500
+}
+
+FILLER = (
+    "Mix the flour and water until no dry bits remain, rest the dough, then knead until smooth "
+    "and elastic. Let it ferment covered at room temperature, shape gently and bake in a very hot oven."
+).split()
+
+
+def _sample_ttft() -> float:
+    return random.lognormvariate(math.log(CONFIG["ttft_ms"] / 1000), CONFIG["ttft_sigma"])
+
+
+def _sample_rate() -> float:
+    jitter = CONFIG["rate_jitter"]
+    return max(1.0, CONFIG["tokens_per_sec"] * random.uniform(1 - jitter, 1 + jitter))
+
+
+def _wants_json(messages: list) -> bool:
+    return any("json" in str(m.get("content", "")).lower() for m in messages)
+
+
+def _prose(n_words: int) -> list:
+    return [FILLER[i % len(FILLER)] for i in range(n_words)]
+
+
+def _json_reply(n_words: int) -> str:
+    # Several top-level keys so streamed field events can be observed
+    words = _prose(max(n_words - 40, 10))
+    third = max(len(words) // 3, 1)
+    reply = {
+        "dish": "Benchmark Loaf",
+        "step_details": [" ".join(words[:third]), " ".join(words[third:2 * third])],
+        "equipment_notes": " ".join(words[2 * third:]),
+        "ingredients": [{"name": "flour", "quantity_grams": 500}, {"name": "water", "quantity_grams": 350}],
+        "storage_tips": "Keep in a paper bag for two days.",
+    }
+    return json.dumps(reply, ensure_ascii=False)
+
+
+def _reply_tokens(body: dict) -> list:
+    """Split the canned reply into roughly token-sized pieces"""
+    n_words = min(CONFIG["completion_tokens"], body.get("max_tokens") or CONFIG["completion_tokens"])
+    text = _json_reply(n_words) if _wants_json(body.get("messages", [])) else " ".join(_prose(n_words))
+    pieces = text.split(" ")
+    return [p if i == 0 else " " + p for i, p in enumerate(pieces)]
+
+
+def _usage(body: dict, completion_tokens: int) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _maybe_error():
+    if random.random() < CONFIG["error_rate"]:
+        status = random.choice([429, 500])
+        return JSONResponse({"error": {"message": "Injected failure", "type": "fake_error", "code": status}}, status_code=status)
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = _maybe_error()
+    if error:
+        return error
+
+    tokens = _reply_tokens(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o-mini")
+    rate = _sample_rate()
+
+    if body.get("stream"):
+        async def events():
+            await asyncio.sleep(_sample_ttft())
+            for i, token in enumerate(tokens):
+                delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / rate)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(_sample_ttft() + len(tokens) / rate)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(body, len(tokens)),
+    }
+
+
+def _fake_vector(item, dimensions: int) -> list:
+    # Deterministic per input so identical texts embed identically
+    seed = int(hashlib.sha256(json.dumps(item).encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    vector = [rng.uniform(-1, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    error = _maybe_error()
+    if error:
+        return error
+
+    inputs = body.get("input", [])
+    # A single string or a single token array is one input
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    dimensions = body.get("dimensions") or 1536
+
+    await asyncio.sleep(random.lognormvariate(math.log(CONFIG["embedding_ms"] / 1000), 0.3))
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-ada-002"),
+        "data": [{"object": "embedding", "index": i, "embedding": _fake_vector(item, dimensions)} for i, item in enumerate(inputs)],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=CONFIG["ttft_ms"], help="median time to first token")
+    parser.add_argument("--ttft-sigma", type=float, default=CONFIG["ttft_sigma"], help="log-normal sigma of the time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=CONFIG["tokens_per_sec"])
+    parser.add_argument("--rate-jitter", type=float, default=CONFIG["rate_jitter"])
+    parser.add_argument("--completion-tokens", type=int, default=CONFIG["completion_tokens"])
+    parser.add_argument("--embedding-ms", type=float, default=CONFIG["embedding_ms"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="fraction of requests answered with 429/500")
+    args = parser.parse_args()
+
+    for key in CONFIG:
+        CONFIG[key] = getattr(args, key)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Minimal in-memory Redis-protocol (RESP) server for local testing of STATE_BACKEND=redis
+
+Supports PING, AUTH, SELECT, GET, SET (with EX/PX), DEL, EXISTS, EXPIRE, TTL and
+FLUSHDB, which is everything the app's RedisBackend uses.
+
+    python bench/fake_redis.py --port 6390
+    STATE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app
+"""
+import argparse
+import asyncio
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        self.dbs = {}
+
+    def _db(self, index: int) -> dict:
+        return self.dbs.setdefault(index, {})
+
+    def _live(self, db: dict, key: str):
+        entry = db.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del db[key]
+            return None
+        return entry
+
+    def command(self, state: dict, args: list):
+        name = args[0].upper()
+        db = self._db(state["db"])
+        if name == b"PING":
+            return "+PONG"
+        if name == b"AUTH":
+            return "+OK"
+        if name == b"SELECT":
+            state["db"] = int(args[1])
+            return "+OK"
+        if name == b"GET":
+            entry = self._live(db, args[1])
+            return entry[0] if entry else None
+        if name == b"SET":
+            expires_at = None
+            options = [a.upper() for a in args[3:]]
+            for i, option in enumerate(options):
+                if option == b"EX":
+                    expires_at = time.monotonic() + int(args[4 + i])
+                elif option == b"PX":
+                    expires_at = time.monotonic() + int(args[4 + i]) / 1000
+            db[args[1]] = (args[2], expires_at)
+            return "+OK"
+        if name == b"DEL":
+            return sum(1 for key in args[1:] if self._live(db, key) and db.pop(key, None))
+        if name == b"EXISTS":
+            return sum(1 for key in args[1:] if self._live(db, key))
+        if name == b"EXPIRE":
+            entry = self._live(db, args[1])
+            if not entry:
+                return 0
+            db[args[1]] = (entry[0], time.monotonic() + int(args[2]))
+            return 1
+        if name == b"TTL":
+            entry = self._live(db, args[1])
+            if not entry:
+                return -2
+            return -1 if entry[1] is None else int(entry[1] - time.monotonic())
+        if name == b"FLUSHDB":
+            db.clear()
+            return "+OK"
+        return f"-ERR unknown command '{name.decode()}'"
+
+
+def encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return reply.encode("utf-8") + b"\r\n"
+
+
+async def read_command(reader) -> list:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command (e.g. typed in telnet)
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol server for tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server_state = FakeRedis()
+
+    async def handle(reader, writer):
+        state = {"db": 0}
+        try:
+            while True:
+                command = await read_command(reader)
+                if not command:
+                    break
+                writer.write(encode(server_state.command(state, command)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""End-to-end load benchmark for the API
+
+Drives /bread, /recipes, /ask/, /pinochat and /upload-pizza-image/ with realistic
+multi-turn conversations at a fixed concurrency and reports p50/p95/p99 latency and
+throughput per route. Run the app against bench/fake_openai.py to keep it offline:
+
+    python bench/fake_openai.py --port 9100 &
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_BASE=http://127.0.0.1:9100/v1 \\
+        OPENAI_API_KEY=fake uvicorn main:app --port 8000 &
+    python bench/load_test.py --base-url http://127.0.0.1:8000 --concurrency 50 --duration 60
+
+Each virtual user repeatedly picks a scenario (weighted by --mix) and plays it to the end;
+every HTTP request is timed and reported under its route.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+from PIL import Image
+
+DEFAULT_MIX = "bread=3,recipes=2,ask=2,pinochat=2,upload=1"
+
+BREAD_ANSWERS = [
+    "beginner",
+    "rustic",
+    "bread flour",
+    "dry yeast",
+    "stand mixer and static oven",
+    "12h",
+    "21°C",
+    None,  # final amount, varied per conversation so the recipe cache does not absorb every run
+    "none",
+    "mixed",
+]
+
+PINOCHAT_ANSWERS = [
+    "Pizza, savory",
+    "flour, tomatoes, mozzarella, basil",
+    "no restrictions",
+    "Tentazione electric oven and a stand mixer",
+    "simple, about one hour",
+    "4 people",
+    "classic Neapolitan",
+]
+
+
+class Stats:
+    """Latency samples and error counts per route"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+
+async def timed(client: httpx.AsyncClient, stats: Stats, route: str, **kwargs) -> httpx.Response:
+    start = time.perf_counter()
+    try:
+        response = await client.post(route, **kwargs)
+    except httpx.HTTPError:
+        stats.record(route, time.perf_counter() - start, False)
+        raise
+    # Streamed responses are timed until the last byte
+    await response.aread()
+    stats.record(route, time.perf_counter() - start, response.status_code < 400)
+    return response
+
+
+# --- Scenarios ---
+async def bread_scenario(client, stats, n: int):
+    session_id = f"bench-{uuid.uuid4()}"
+    answers = list(BREAD_ANSWERS)
+    answers[BREAD_ANSWERS.index(None)] = f"{400 + (n % 50) * 10} g"
+    payload = {"session_id": session_id, "input_text": "one-by-one", "language": "en"}
+    response = await timed(client, stats, "/bread", json=payload)
+    for answer in answers:
+        if response.json().get("status") != "question":
+            break
+        response = await timed(client, stats, "/bread", json={**payload, "input_text": answer})
+
+
+async def recipes_scenario(client, stats, n: int):
+    payload = {"session_id": f"bench-{uuid.uuid4()}", "input_text": "all-at-once", "language": "en"}
+    await timed(client, stats, "/recipes", json=payload)
+    text = f"Vegetarian pasta for {2 + n % 6} people, Italian style, with zucchini, no nuts, stove only, 30 minutes"
+    await timed(client, stats, "/recipes", json={**payload, "input_text": text})
+
+
+async def ask_scenario(client, stats, n: int):
+    data = {"question": "I want to make Neapolitan pizza, I am a beginner", "language": "en", "conversation_id": f"bench-{uuid.uuid4()}"}
+    await timed(client, stats, "/ask/", data=data)
+
+
+async def pinochat_scenario(client, stats, n: int):
+    response = await timed(client, stats, "/start-pinochat", json={"language": "en"})
+    conversation_id = response.json()["conversation_id"]
+    for answer in PINOCHAT_ANSWERS:
+        await timed(client, stats, "/pinochat", json={"message": answer, "conversation_id": conversation_id, "language": "en"})
+
+
+def _pizza_image() -> bytes:
+    image = Image.new("RGB", (320, 320), (200, 120, 60))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+async def upload_scenario(client, stats, n: int, image: bytes = None):
+    files = {"file": ("pizza.jpg", image, "image/jpeg")}
+    await timed(client, stats, "/upload-pizza-image/", files=files, data={"language": "en"})
+
+
+SCENARIOS = {
+    "bread": bread_scenario,
+    "recipes": recipes_scenario,
+    "ask": ask_scenario,
+    "pinochat": pinochat_scenario,
+    "upload": upload_scenario,
+}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}', choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def virtual_user(client, stats, weights: dict, deadline: float, counter: list, image: bytes):
+    names, values = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        name = random.choices(names, values)[0]
+        counter[0] += 1
+        kwargs = {"image": image} if name == "upload" else {}
+        try:
+            await SCENARIOS[name](client, stats, counter[0], **kwargs)
+        except (httpx.HTTPError, ValueError, KeyError):
+            # Already recorded as an error; abandon the rest of this conversation
+            pass
+
+
+# --- Reporting ---
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(stats: Stats, elapsed: float) -> list:
+    rows = []
+    for route in sorted(stats.latencies):
+        samples = stats.latencies[route]
+        rows.append({
+            "route": route,
+            "requests": len(samples),
+            "errors": stats.errors[route],
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "mean_ms": round(statistics.mean(samples) * 1000, 1),
+        })
+    return rows
+
+
+def print_table(rows: list, elapsed: float):
+    header = f"{'route':<22}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['route']:<22}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    total = sum(row["requests"] for row in rows)
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+async def run(args) -> list:
+    weights = parse_mix(args.mix)
+    stats = Stats()
+    image = _pizza_image()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        counter = [0]
+        await asyncio.gather(*[virtual_user(client, stats, weights, deadline, counter, image) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+
+    rows = summarize(stats, elapsed)
+    print_table(rows, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "duration": elapsed, "mix": weights, "routes": rows}, f, indent=2)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the pizza/bread API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=20, help="number of virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting new conversations")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. bread=3,ask=1")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
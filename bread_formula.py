@@ -0,0 +1,265 @@
+"""
+Deterministic bread formula engine.
+
+Computes the ingredient table (grams + baker's percentages), hydration and the
+fermentation timeline from the normalized answers collected by the /bread router,
+so the LLM is only needed for prose. Uses the same formulas as the pizza tools:
+flour = dough / (1 + hydration), yeast = flour × 23 ÷ (hours × hydration% × temp)
+and the 1/4 bulk + 3/4 final proof fermentation rule.
+"""
+import re
+
+
+# --- Shared dough formulas (also used by tool_calling) ---
+def flour_and_water(total_dough_weight: float, hydration_percent: float) -> tuple:
+    """Split a dough weight into flour and water for the given hydration"""
+    hydration_ratio = hydration_percent / 100.0
+    flour = round(total_dough_weight / (1 + hydration_ratio))
+    water = round(flour * hydration_ratio)
+    return flour, water
+
+
+def fresh_yeast_grams(flour: float, fermentation_hours: float, hydration_percent: float, room_temperature: float) -> float:
+    """Fresh yeast formula: (Flour × 23) ÷ (Time × Hydration% × Temp)"""
+    return round((flour * 23) / (fermentation_hours * hydration_percent * room_temperature), 1)
+
+
+def dry_yeast_grams(fresh_grams: float) -> float:
+    """Fresh → dry yeast: 1:1 up to 3g, 2:3 for 4-9g, 1:3 from 10g"""
+    if fresh_grams <= 3:
+        return round(fresh_grams, 1)
+    if fresh_grams < 10:
+        return round(fresh_grams * 2 / 3, 1)
+    return round(fresh_grams / 3, 1)
+
+
+def split_fermentation(fermentation_hours: float) -> tuple:
+    """1/4 of the total time = bulk fermentation, 3/4 = final proof"""
+    bulk_hours = round(fermentation_hours * 0.25)
+    return bulk_hours, fermentation_hours - bulk_hours
+
+
+# --- Bread profiles ---
+# hydration %, extra ingredients as baker's %, bake temperature (°C) and minutes, default piece weight (g)
+BREAD_PROFILES = {
+    "rustic": {"name": "Rustic Loaf", "hydration": 70, "extras": {}, "bake": (240, 40), "piece": 750},
+    "whole wheat": {"name": "Whole Wheat Loaf", "hydration": 75, "extras": {}, "bake": (230, 40), "piece": 750},
+    "baguette": {"name": "Baguette", "hydration": 68, "extras": {}, "bake": (250, 22), "piece": 300},
+    "focaccia": {"name": "Focaccia", "hydration": 80, "extras": {"extra virgin olive oil": 5}, "bake": (230, 22), "piece": 800},
+    "sandwich loaf": {"name": "Sandwich Loaf", "hydration": 62, "extras": {"oil": 4, "sugar": 3}, "bake": (200, 35), "piece": 800},
+    "rolls": {"name": "Bread Rolls", "hydration": 60, "extras": {"oil": 4}, "bake": (220, 16), "piece": 80},
+    "ciabatta": {"name": "Ciabatta", "hydration": 78, "extras": {}, "bake": (240, 25), "piece": 450},
+    "sourdough": {"name": "Sourdough Loaf", "hydration": 72, "extras": {}, "bake": (240, 42), "piece": 750},
+    "rye": {"name": "Rye Bread", "hydration": 78, "extras": {}, "bake": (230, 50), "piece": 750},
+}
+DEFAULT_PROFILE = "rustic"
+
+FERMENTATION_HOURS = {"a few hours": 4, "12h": 12, "24h": 24, "48h": 48}
+
+# Starter as % of flour, by fermentation length (longer time → less starter)
+STARTER_PERCENTAGES = ((6, 30), (12, 20), (24, 10))
+STARTER_MIN_PERCENTAGE = 5
+
+
+def _parse_hours(value) -> float:
+    text = str(value or "").lower()
+    if text in FERMENTATION_HOURS:
+        return FERMENTATION_HOURS[text]
+    match = re.search(r"(\d+(?:\.\d+)?)", text)
+    if match and float(match.group(1)) > 0:
+        return float(match.group(1))
+    return FERMENTATION_HOURS["12h"]
+
+
+TEMPERATURE_RE = re.compile(r"(-?\d+(?:\.\d+)?)\s*(?:°|º|degrees?|deg)?\s*(?:([cf])(?:elsius|ahrenheit)?\b)?")
+
+
+def _parse_temperature_c(value) -> float:
+    text = str(value or "").lower()
+    match = TEMPERATURE_RE.search(text)
+    if not match:
+        return 20.0
+    temp = float(match.group(1))
+    # Fahrenheit if the number carries an F unit, or if it only makes sense as °F
+    unit = match.group(2)
+    if unit == "f" or (unit is None and temp >= 45):
+        temp = (temp - 32) * 5 / 9
+    return min(max(temp, 4.0), 35.0)
+
+
+def _parse_total_weight(value, piece_weight: int) -> tuple:
+    """Return (total dough grams, number of pieces) from the final_amount answer"""
+    text = str(value or "").lower()
+    grams = re.search(r"(\d+(?:\.\d+)?)\s*g(?:r|ram)?s?\b", text)
+    kilos = re.search(r"(\d+(?:\.\d+)?)\s*kg", text)
+    count = re.search(r"(\d+)\s*(?:x\s*)?(loa(?:f|ves)|rolls?|buns?|pieces?|baguettes?|focaccias?)", text)
+    # "0 loaves" is still one piece
+    pieces = max(int(count.group(1)), 1) if count else 1
+    total = 0.0
+    if kilos:
+        total = float(kilos.group(1)) * 1000
+    elif grams:
+        total = float(grams.group(1))
+        # "2 loaves (500g)" means 500 g each
+        if count and ("each" in text or (pieces > 1 and total < piece_weight * pieces / 2)):
+            total *= pieces
+    # No usable weight ("0g", or none given): the default piece weight for each piece
+    if total <= 0:
+        total = float(piece_weight * pieces)
+    return total, pieces
+
+
+def _profile_for(bread_type) -> tuple:
+    text = str(bread_type or "").lower()
+    for key in BREAD_PROFILES:
+        if key in text:
+            return key, BREAD_PROFILES[key]
+    return DEFAULT_PROFILE, BREAD_PROFILES[DEFAULT_PROFILE]
+
+
+def _hydration_for(profile: dict, flours: str, experience: str, profile_key: str) -> int:
+    hydration = profile["hydration"]
+    # Whole grain and rye flours absorb more water
+    if profile_key not in ("whole wheat", "rye") and any(f in flours for f in ("whole wheat", "rye", "multigrain")):
+        hydration += 3
+    # Keep the dough forgiving for beginners
+    if experience == "beginner" and hydration > 70:
+        hydration -= 3
+    return hydration
+
+
+def _leavening_percentage(leavening: str, flour_estimate: float, hours: float, hydration: int, temp_c: float) -> tuple:
+    """Return (ingredient name, baker's %) for the chosen leavening, or (None, 0) when unleavened"""
+    if leavening == "none":
+        return None, 0
+    if "starter" in leavening:
+        percentage = STARTER_MIN_PERCENTAGE
+        for max_hours, starter_percentage in STARTER_PERCENTAGES:
+            if hours <= max_hours:
+                percentage = starter_percentage
+                break
+        return leavening, percentage
+    # Tiny doughs can round to 0 g of flour
+    flour_estimate = max(flour_estimate, 1)
+    fresh = max(fresh_yeast_grams(flour_estimate, hours, hydration, temp_c), 0.1)
+    if leavening == "dry yeast":
+        return "dry yeast", round(dry_yeast_grams(fresh) / flour_estimate * 100, 2)
+    return "fresh yeast", round(fresh / flour_estimate * 100, 2)
+
+
+def _ingredient_grams(flour: float, percentage: float) -> float:
+    """Leavening under 1% and anything under 1 g keep one decimal (at least 0.1 g), everything else whole grams"""
+    amount = flour * percentage / 100
+    if percentage < 1 or amount < 1:
+        return max(round(amount, 1), 0.1) if percentage > 0 else 0
+    return round(amount)
+
+
+def _duration(hours: float) -> str:
+    """'45 minutes', '1 hour', '1.5 hours', '12 hours'"""
+    if hours < 1:
+        return f"{round(hours * 60)} minutes"
+    hours = round(hours, 1)
+    if hours == int(hours):
+        hours = int(hours)
+    return "1 hour" if hours == 1 else f"{hours} hours"
+
+
+def compute_bread_formula(answers: dict) -> dict:
+    """Compute the quantitative part of a bread recipe from normalized /bread answers"""
+    profile_key, profile = _profile_for(answers.get("bread_type"))
+    flours = str(answers.get("available_flours") or "all-purpose").lower()
+    experience = str(answers.get("experience") or "beginner").lower()
+    leavening = str(answers.get("leavening") or "dry yeast").lower()
+    dietary = str(answers.get("dietary") or "none").lower()
+    equipment = str(answers.get("equipment") or "").lower()
+
+    hours = _parse_hours(answers.get("fermentation_time"))
+    temp_c = _parse_temperature_c(answers.get("room_temperature"))
+    total_weight, pieces = _parse_total_weight(answers.get("final_amount"), profile["piece"])
+    hydration = _hydration_for(profile, flours, experience, profile_key)
+
+    percentages = {"water": hydration, "salt": 1.5 if "low-salt" in dietary or "low salt" in dietary else 2}
+    for name, percentage in profile["extras"].items():
+        if name == "sugar" and "sugar" in dietary:
+            continue
+        percentages[name] = percentage
+
+    # First pass estimates flour to size the yeast; the leavening is tiny so one pass is enough
+    flour_estimate, _ = flour_and_water(total_weight, sum(percentages.values()))
+    leavening_name, leavening_percentage = _leavening_percentage(leavening, flour_estimate, hours, hydration, temp_c)
+    if leavening_name:
+        percentages[leavening_name] = leavening_percentage
+
+    # A starter is already half flour and half water, so it is part of the flour and water
+    # totals rather than an extra on top of them
+    is_starter = bool(leavening_name) and "starter" in leavening_name
+    flour, _ = flour_and_water(total_weight, sum(p for name, p in percentages.items() if not (is_starter and name == leavening_name)))
+    grams = {name: _ingredient_grams(flour, percentage) for name, percentage in percentages.items()}
+
+    # Starters are 100% hydration: half their weight is flour and half is water
+    flour_added, water_added = flour, grams["water"]
+    if is_starter:
+        flour_added = round(flour - grams[leavening_name] / 2)
+        water_added = round(grams["water"] - grams[leavening_name] / 2)
+
+    flour_name = flours.split(",")[0].strip() or "all-purpose"
+    if "gluten" in dietary:
+        flour_name = "gluten-free bread flour mix"
+    ingredients = [{"name": f"{flour_name} flour" if "flour" not in flour_name else flour_name, "quantity_grams": flour_added, "baker_percentage": 100}]
+    ingredients.append({"name": "water", "quantity_grams": water_added, "baker_percentage": hydration})
+    for name, percentage in percentages.items():
+        if name != "water":
+            ingredients.append({"name": name, "quantity_grams": grams[name], "baker_percentage": percentage})
+
+    bakers_percentages = {"flour": 100, **percentages}
+
+    return {
+        "dish": profile["name"] if pieces == 1 else f"{profile['name']} ({pieces} pieces)",
+        "ingredients": ingredients,
+        "hydration": f"{hydration}%",
+        "bakers_percentages": bakers_percentages,
+        "timeline": build_timeline(profile_key, profile, hours, temp_c, leavening, equipment, pieces, round(total_weight)),
+    }
+
+
+def build_timeline(profile_key: str, profile: dict, hours: float, temp_c: float, leavening: str, equipment: str, pieces: int, total_weight: int) -> list:
+    """Fermentation and bake schedule using the 1/4 bulk + 3/4 proof rule"""
+    bake_temp, bake_minutes = profile["bake"]
+    steps = []
+
+    if leavening != "none":
+        steps.append("Autolyse - mix flour and most of the water, rest 30 minutes")
+    if "mixer" in equipment:
+        steps.append("Mix - add leavening, salt and remaining water; knead 6-8 minutes on low-medium speed until smooth")
+    else:
+        steps.append("Mix - add leavening, salt and remaining water; knead by hand 10 minutes, then rest 10 minutes")
+
+    if leavening == "none":
+        steps.append("Rest - cover and rest 30 minutes at room temperature")
+    else:
+        bulk_hours, proof_hours = split_fermentation(hours)
+        if hours > 12:
+            steps.append(f"Bulk fermentation - {_duration(bulk_hours)} at {round(temp_c)}°C with 3 sets of stretch-and-folds in the first 90 minutes")
+            steps.append(f"Cold retard - {_duration(proof_hours - 2)} in the fridge (4°C), covered")
+            final_proof = 2
+        else:
+            # Whole-hour rounding would leave no bulk time under 3 hours; keep the exact quarter
+            # there, so bulk + proof always adds up to the requested time
+            if bulk_hours < 1:
+                bulk_hours = hours * 0.25
+            steps.append(f"Bulk fermentation - {_duration(bulk_hours)} at {round(temp_c)}°C with 2-3 sets of stretch-and-folds")
+            final_proof = hours - bulk_hours
+        piece_weight = round(total_weight / max(pieces, 1))
+        steps.append(f"Divide and shape - {pieces} x {piece_weight} g" if pieces > 1 else "Pre-shape, rest 20 minutes, then shape")
+        steps.append(f"Final proof - {_duration(final_proof)} at {round(temp_c)}°C until it springs back slowly when poked")
+
+    if "dutch" in equipment and profile_key not in ("focaccia", "rolls", "baguette", "sandwich loaf"):
+        steps.append(f"Bake - preheat oven and Dutch oven to {bake_temp}°C for 45 minutes; bake lid on 20 minutes, lid off {max(bake_minutes - 20, 10)} minutes")
+    elif "stone" in equipment:
+        steps.append(f"Bake - preheat stone at {bake_temp}°C for 45 minutes; bake {bake_minutes} minutes with steam for the first 10")
+    else:
+        steps.append(f"Bake - {bake_minutes} minutes at {bake_temp}°C, with steam for the first 10 minutes")
+    steps.append("Cool - at least 1 hour on a rack before slicing" if profile_key != "rye" else "Cool - at least 4 hours (ideally overnight) before slicing")
+
+    return [f"Step {i + 1}: {step}" for i, step in enumerate(steps)]
@@ -0,0 +1,144 @@
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Load environment variables
+load_dotenv()
+
+# --- Pool sizing ---
+# fixed: DB_POOL_SIZE + DB_MAX_OVERFLOW per worker
+# auto: split the DB_MAX_CONNECTIONS budget between WEB_CONCURRENCY workers and keep
+#       DB_POOL_TARGET (the observed steady concurrency, see /metrics) connections open
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "fixed")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "5"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_POOL_TARGET = int(os.getenv("DB_POOL_TARGET", "0"))
+
+# --- Pre-ping ---
+# always: ping on every checkout; idle: only when the connection has not been used for
+# DB_PRE_PING_IDLE_SECONDS; off: never (stale connections surface as query errors)
+DB_PRE_PING = os.getenv("DB_PRE_PING", "always")
+DB_PRE_PING_IDLE_SECONDS = float(os.getenv("DB_PRE_PING_IDLE_SECONDS", "30"))
+
+
+def pool_settings(mode: str = DB_POOL_MODE) -> dict:
+    """pool_size / max_overflow for this worker"""
+    if mode == "fixed":
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    if mode != "auto":
+        raise ValueError(f"Unknown DB_POOL_MODE '{mode}' (use fixed or auto)")
+    per_worker = max(2, (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // max(1, WEB_CONCURRENCY))
+    target = DB_POOL_TARGET or (per_worker + 1) // 2
+    pool_size = max(1, min(target, per_worker))
+    settings = {"pool_size": pool_size, "max_overflow": per_worker - pool_size}
+    print(f"[{datetime.now()}] DB pool (auto): {settings} for {WEB_CONCURRENCY} worker(s), {DB_MAX_CONNECTIONS} connections")
+    return settings
+
+
+class PoolMetrics:
+    """Checkout latency, pre-ping cost and peak concurrency of one pool"""
+
+    def __init__(self):
+        self.pool = None
+        self.pre_ping = None
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.pings = 0
+        self.ping_seconds = 0.0
+        self.pings_skipped = 0
+        self.ping_failures = 0
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        if pool is None:
+            return {}
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "avg_checkout_ms": round(self.checkout_seconds * 1000 / self.checkouts, 2) if self.checkouts else 0.0,
+            "max_checkout_ms": round(self.max_checkout_seconds * 1000, 1),
+            "timeouts": self.timeouts,
+            "pre_ping": self.pre_ping,
+            "pings": self.pings,
+            "avg_ping_ms": round(self.ping_seconds * 1000 / self.pings, 2) if self.pings else 0.0,
+            "pings_skipped": self.pings_skipped,
+            "ping_failures": self.ping_failures,
+            # Feed back as DB_POOL_TARGET with DB_POOL_MODE=auto
+            "suggested_pool_target": self.peak_checked_out + 1,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waits"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        elapsed = time.perf_counter() - start
+        pool_metrics.checkouts += 1
+        pool_metrics.checkout_seconds += elapsed
+        pool_metrics.max_checkout_seconds = max(pool_metrics.max_checkout_seconds, elapsed)
+        pool_metrics.peak_checked_out = max(pool_metrics.peak_checked_out, self.checkedout())
+        return connection
+
+
+def install_pool_events(engine, pre_ping: str = DB_PRE_PING, idle_seconds: float = DB_PRE_PING_IDLE_SECONDS):
+    """Attach metrics and the pre-ping policy to an engine created with pool_pre_ping=False"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if pre_ping not in ("always", "idle", "off"):
+        raise ValueError(f"Unknown DB_PRE_PING '{pre_ping}' (use always, idle or off)")
+    pool_metrics.pool = sync_engine.pool
+    pool_metrics.pre_ping = pre_ping
+    if pre_ping == "off":
+        return
+    threshold = 0.0 if pre_ping == "always" else idle_seconds
+
+    @event.listens_for(sync_engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        connection_record.info["validated_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checked_in(dbapi_connection, connection_record):
+        if connection_record is not None and dbapi_connection is not None:
+            connection_record.info["validated_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        if time.monotonic() - connection_record.info.get("validated_at", 0.0) < threshold:
+            pool_metrics.pings_skipped += 1
+            return
+        start = time.perf_counter()
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            pool_metrics.ping_failures += 1
+            # The pool discards this connection and retries the checkout with a fresh one
+            raise exc.DisconnectionError() from e
+        finally:
+            pool_metrics.pings += 1
+            pool_metrics.ping_seconds += time.perf_counter() - start
+        connection_record.info["validated_at"] = time.monotonic()
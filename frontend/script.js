@@ -135,6 +135,56 @@ function renderRecipe(recipe) {
   });
 }
 
+// --- Read a Server-Sent Events stream from a fetch response ---
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      frame.split("\n").forEach(line => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// --- Render the recipe progressively as fields arrive ---
+async function handleRecipeStream(res) {
+  const partial = {};
+  let started = false;
+  await readEventStream(res, (event, data) => {
+    if (event === "field") {
+      if (!started) {
+        chatBox.lastChild.remove(); // remove "Thinking..." message
+        addMessage("Your recipe is on its way... 🍞", "bot");
+        started = true;
+      }
+      partial[data.field] = data.value;
+      renderRecipe(partial);
+    } else if (event === "done") {
+      if (!started) chatBox.lastChild.remove();
+      started = true;
+      if (data.message) addMessage(data.message, "bot");
+      renderRecipe(data.recipe);
+    } else if (event === "error") {
+      if (!started) chatBox.lastChild.remove();
+      started = true;
+      addMessage("⚠️ " + (data.message || "Error occurred."), "bot");
+    }
+  });
+}
+
 // --- Handle user submission ---
 chatForm.addEventListener("submit", async (e) => {
   e.preventDefault();
@@ -152,10 +202,17 @@ chatForm.addEventListener("submit", async (e) => {
       body: JSON.stringify({
         session_id: sessionId,
         input_text: text,
-        language: "en"
+        language: "en",
+        stream: true
       }),
     });
 
+    // The final recipe step answers with an event stream, other turns with JSON
+    if ((res.headers.get("content-type") || "").includes("text/event-stream")) {
+      await handleRecipeStream(res);
+      return;
+    }
+
     const data = await res.json();
     chatBox.lastChild.remove(); // remove "Thinking..." message
 
@@ -0,0 +1,112 @@
+from collections import deque
+from typing import NamedTuple
+
+
+class KeywordMatch(NamedTuple):
+    field: str
+    keyword: str
+    value: object
+    start: int
+    end: int
+    order: int  # declaration order of the keyword: lower wins
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over the keywords of several fields, built once
+
+    `fields` maps a field name to {keyword: value}. One pass over the text finds every
+    keyword of every field.
+
+    Word-boundary semantics:
+    - A match must start at a word boundary, so "ap" does not match inside "map".
+    - A keyword ending in a digit must also end at a boundary, so "2h" does not match
+      inside "12h".
+    - A keyword ending in a letter may run on into the rest of its word, so "begin"
+      matches "beginner" and "roll" matches "rolls".
+
+    Priority is deterministic. Within a field, a match nested inside a longer match is
+    dropped ("2 day" wins over "day" in "2 days"). The remaining matches rank in the
+    order the keywords were declared.
+    """
+
+    def __init__(self, fields: dict):
+        self.patterns = []  # index -> (field, keyword, value, order)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for field, keywords in fields.items():
+            for order, (keyword, value) in enumerate(keywords.items()):
+                self._add(keyword.lower(), len(self.patterns))
+                self.patterns.append((field, keyword.lower(), value, order))
+        self._build_failure_links()
+
+    def _add(self, keyword: str, index: int):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                # Every keyword ending at the fallback state also ends here
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> list:
+        """Every boundary-respecting keyword occurrence, in text order"""
+        text = text.lower()
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for index in self._out[state]:
+                field, keyword, value, order = self.patterns[index]
+                start, end = i + 1 - len(keyword), i + 1
+                if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(keyword[0]):
+                    continue
+                if end < len(text) and keyword[-1].isdigit() and text[end].isdigit():
+                    continue
+                matches.append(KeywordMatch(field, keyword, value, start, end, order))
+        return matches
+
+    def best_matches(self, text: str) -> list:
+        """find_all without the matches nested inside a longer match of the same field"""
+        matches = self.find_all(text)
+        return [
+            m for m in matches
+            if not any(o.field == m.field and o.start <= m.start and m.end <= o.end and (o.end - o.start) > (m.end - m.start) for o in matches)
+        ]
+
+    def match(self, text: str) -> dict:
+        """field -> distinct matched values, best first"""
+        by_field = {}
+        for m in sorted(self.best_matches(text), key=lambda m: (m.order, m.start)):
+            values = by_field.setdefault(m.field, [])
+            if m.value not in values:
+                values.append(m.value)
+        return by_field
+
+    def first(self, text: str, field: str):
+        """Best value of one field, or None"""
+        values = self.match(text).get(field)
+        return values[0] if values else None
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import random
+import re
+from contextlib import asynccontextmanager
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+from llm_json import repair_json
+from scheduler import PriorityScheduler
+from singleflight import SingleFlight, prompt_key
+
+# Load environment variables
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# --- Gateway tuning ---
+# One pool per process: every router reuses the same keep-alive connections
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+# Upper bound on LLM requests in flight across the whole process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+# Per-class budgets within that cap: short interactive turns (extraction, chat, vision)
+# are admitted before queued heavy generations, which can never take every slot
+LLM_INTERACTIVE_CONCURRENCY = int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+LLM_GENERATION_CONCURRENCY = int(os.getenv("LLM_GENERATION_CONCURRENCY", str(max(1, LLM_MAX_CONCURRENCY * 3 // 4))))
+# Transport-level retries (connection errors, timeouts, 429 and 5xx)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# How many times a reply cut off by max_tokens is continued before parsing what we have
+LLM_MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "1"))
+
+# Per-model request timeouts in seconds; unknown models use LLM_TIMEOUT_SECONDS
+MODEL_TIMEOUTS = {
+    "gpt-4o-mini": 60.0,
+    "gpt-4-turbo": 30.0,
+    "gpt-3.5-turbo": 30.0,
+    "gpt-3.5-turbo-16k": 60.0,
+}
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+_http_client = None
+_async_client = None
+_scheduler = None
+# Identical prompts in flight at the same time share one upstream call
+_llm_flights = SingleFlight()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled HTTP client shared by every LLM caller"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0),
+        )
+    return _http_client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client, creating it on first use"""
+    global _async_client
+    if _async_client is None:
+        # Retries are handled by the gateway so backoff and the concurrency cap apply
+        _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=get_http_client(), max_retries=0)
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared client and its connection pool (app shutdown)"""
+    global _async_client, _http_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def timeout_for(model: str) -> float:
+    return MODEL_TIMEOUTS.get(model, LLM_TIMEOUT_SECONDS)
+
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+GENERATION = "generation"
+
+
+def get_scheduler() -> PriorityScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PriorityScheduler(
+            total=LLM_MAX_CONCURRENCY,
+            budgets={INTERACTIVE: LLM_INTERACTIVE_CONCURRENCY, GENERATION: LLM_GENERATION_CONCURRENCY},
+            priorities=[INTERACTIVE, GENERATION],
+        )
+    return _scheduler
+
+
+@asynccontextmanager
+async def llm_slot(priority: str = INTERACTIVE):
+    """Hold one of the process-wide request slots in the given priority class"""
+    async with get_scheduler().slot(priority):
+        yield
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter: spread retries so a burst of failures does not retry in lockstep
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def with_retries(call, retries: int = None, priority: str = INTERACTIVE):
+    """Await call() under the concurrency cap, retrying transient errors with jittered backoff"""
+    retries = LLM_MAX_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            async with llm_slot(priority):
+                return await call()
+        except RETRYABLE_ERRORS:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(_backoff_delay(attempt))
+
+
+# --- Async chat completion ---
+async def chat_completion(conversation: list, model: str = "gpt-4o-mini", temperature: float = 0.7, max_tokens: int = 1200, timeout: float = None, priority: str = INTERACTIVE, **kwargs) -> str:
+    """Run a chat completion through the gateway and return the message text"""
+    content, _ = await _chat_completion_with_reason(conversation, model, temperature, max_tokens, timeout, priority, **kwargs)
+    return content.strip()
+
+
+async def _chat_completion_with_reason(conversation: list, model: str, temperature: float, max_tokens: int, timeout: float = None, priority: str = INTERACTIVE, **kwargs):
+    """Like chat_completion, but also return the finish_reason ("length" when cut off by max_tokens)"""
+    client = get_async_client()
+
+    async def call():
+        return await client.chat.completions.create(
+            model=model,
+            messages=conversation,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout or timeout_for(model),
+            **kwargs,
+        )
+
+    resp = await with_retries(call, priority=priority)
+    choice = resp.choices[0]
+    # Unstripped, so a continuation can be appended as-is
+    return choice.message.content or "", choice.finish_reason
+
+
+async def stream_chat_completion(conversation: list, model: str = "gpt-4o-mini", temperature: float = 0.7, max_tokens: int = 1200, timeout: float = None, priority: str = GENERATION, **kwargs):
+    """Stream a chat completion through the gateway, yielding text deltas as they arrive
+
+    The concurrency slot is held for the whole stream. Only opening the stream is retried:
+    once tokens have been yielded a failure is raised to the caller.
+    """
+    client = get_async_client()
+    async with llm_slot(priority):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                stream = await client.chat.completions.create(
+                    model=model,
+                    messages=conversation,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=timeout or timeout_for(model),
+                    stream=True,
+                    **kwargs,
+                )
+                break
+            except RETRYABLE_ERRORS:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+            await asyncio.sleep(_backoff_delay(attempt))
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+# --- JSON repair helpers ---
+def clean_json_string(text: str) -> str:
+    """Clean common JSON formatting issues"""
+    # Remove trailing commas before closing braces/brackets
+    text = re.sub(r',(\s*[}\]])', r'\1', text)
+    # Remove comments (// and /* */)
+    text = re.sub(r'//.*?$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    return text.strip()
+
+
+def parse_json_content(content: str):
+    """Parse JSON from an LLM reply: direct, fenced code block, embedded object, then tolerant repair
+
+    Returns (value, truncated): value is None if all fail, truncated is True when the
+    value was salvaged from cut-off output (parts of it are missing, so do not cache it).
+    """
+    try:
+        return json.loads(content), False
+    except ValueError:
+        pass
+
+    code_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
+    if code_block_match:
+        try:
+            return json.loads(clean_json_string(code_block_match.group(1))), False
+        except ValueError:
+            pass
+
+    json_match = re.search(r'\{.*\}', content, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(clean_json_string(json_match.group(0))), False
+        except ValueError:
+            pass
+
+    # Salvage malformed or truncated output instead of paying for a regeneration
+    return repair_json(content)
+
+
+# --- Helper LLM caller with robust JSON parsing ---
+async def call_llm(conversation: list, model: str = "gpt-4o-mini", temperature: float = 0.7, max_tokens: int = 1500, retries: int = 2, priority: str = INTERACTIVE, return_truncated: bool = False):
+    """Call the LLM and return parsed JSON; regenerates up to `retries` times on unparseable output
+
+    Concurrent calls with an identical prompt and parameters (double-clicks, frontend
+    retries) are coalesced into a single completion whose result is shared.
+    Pass priority=GENERATION for long recipe generations so they queue behind interactive turns.
+    With return_truncated=True the result is (value, truncated), truncated meaning the
+    value was salvaged from cut-off output.
+    """
+    key = prompt_key(conversation, model=model, temperature=temperature, max_tokens=max_tokens, retries=retries)
+    parsed, truncated = await _llm_flights.do(
+        key,
+        lambda: _call_llm_once(conversation, model=model, temperature=temperature, max_tokens=max_tokens, retries=retries, priority=priority),
+    )
+    return (parsed, truncated) if return_truncated else parsed
+
+
+async def _complete_with_continuation(conversation: list, model: str, temperature: float, max_tokens: int, priority: str) -> str:
+    """Run a completion and, if it was cut off by max_tokens, ask the model to carry on from where it stopped"""
+    content, finish_reason = await _chat_completion_with_reason(conversation, model, temperature, max_tokens, priority=priority)
+    for _ in range(LLM_MAX_CONTINUATIONS):
+        if finish_reason != "length":
+            break
+        continuation = conversation + [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": "Your reply was cut off. Continue exactly where it stopped, without repeating anything or adding any other text."},
+        ]
+        more, finish_reason = await _chat_completion_with_reason(continuation, model, temperature, max_tokens, priority=priority)
+        content += more
+    return content
+
+
+async def _call_llm_once(conversation: list, model: str, temperature: float, max_tokens: int, retries: int, priority: str) -> tuple:
+    for attempt in range(retries):
+        try:
+            content = await _complete_with_continuation(conversation, model, temperature, max_tokens, priority)
+
+            parsed, truncated = parse_json_content(content)
+            if parsed is not None:
+                return parsed, truncated
+
+            # Nothing salvageable; if last attempt, return raw
+            if attempt == retries - 1:
+                return {"raw_output": content}, False
+
+        except Exception as e:
+            if attempt == retries - 1:
+                return {"error": str(e)}, False
+
+    return {"error": "Failed to get response"}, False
@@ -0,0 +1,247 @@
+import json
+import re
+
+
+class IncrementalObjectParser:
+    """Parse a streamed JSON object and report each top-level field as soon as its value is complete
+
+    Text before the opening brace (prose, ```json fences) is skipped. Feed chunks in
+    arrival order; feed() returns the (key, value) pairs completed by that chunk.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+        while self._pos < len(buf) and not self.done:
+            ch = buf[self._pos]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:self._pos], completed)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._member_start:self._pos], completed)
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return completed
+
+    def _emit(self, member_text: str, completed: list):
+        member_text = member_text.strip()
+        if not member_text:
+            return
+        try:
+            member = json.loads("{" + member_text + "}")
+        except ValueError:
+            member, _ = repair_json("{" + member_text + "}")
+            if not isinstance(member, dict):
+                # Unrecoverable member: leave it for the whole-document parse at the end
+                return
+        for key, value in member.items():
+            self.fields[key] = value
+            completed.append((key, value))
+
+
+# --- Tolerant repair ---
+_NUMBER = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+
+
+class _Frame:
+    def __init__(self, kind: str):
+        self.kind = kind            # "{" or "["
+        self.count = 0              # members written so far
+        self.expect = "key" if kind == "{" else "value"
+        self.member_start = None    # output length before the current member, to drop it if incomplete
+
+
+def _read_string(text: str, i: int):
+    """Read a quoted string starting at text[i]. Returns (decoded, next index, closed)"""
+    quote = text[i]
+    chars = []
+    i += 1
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            if i + 1 >= len(text):
+                return "".join(chars), len(text), False
+            nxt = text[i + 1]
+            if nxt == "u" and i + 6 <= len(text):
+                try:
+                    chars.append(chr(int(text[i + 2:i + 6], 16)))
+                    i += 6
+                    continue
+                except ValueError:
+                    pass
+            chars.append(_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        if ch == quote:
+            return "".join(chars), i + 1, True
+        chars.append(ch)
+        i += 1
+    return "".join(chars), i, False
+
+
+def repair_json(text: str):
+    """Best-effort single-pass parse of malformed or truncated LLM JSON
+
+    Tolerates prose or fences around the object, comments, trailing or missing commas,
+    unquoted keys, single-quoted strings, Python literals and raw newlines in strings.
+    Truncated output is closed at the last complete member (an unfinished string value
+    is kept). Returns (value, truncated), or (None, False) if there is no object or array.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None, False
+
+    out = []
+    stack = []
+    i = start
+    n = len(text)
+
+    def begin_member(frame):
+        frame.member_start = len(out)
+        if frame.count:
+            out.append(",")
+
+    def end_value():
+        if stack:
+            frame = stack[-1]
+            frame.count += 1
+            frame.expect = "key" if frame.kind == "{" else "value"
+
+    def place_value(token: str) -> bool:
+        """Write a complete value; False if there is no place for one"""
+        if not stack:
+            return False
+        frame = stack[-1]
+        if frame.kind == "[":
+            begin_member(frame)
+        elif frame.expect != "value":
+            return False
+        out.append(token)
+        end_value()
+        return True
+
+    while i < n:
+        ch = text[i]
+        frame = stack[-1] if stack else None
+
+        if ch.isspace() or ch == ",":
+            # Commas are written lazily, which drops trailing ones and restores missing ones
+            i += 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        elif ch in "{[":
+            if frame is not None:
+                if frame.kind == "[":
+                    begin_member(frame)
+                elif frame.expect != "value":
+                    i += 1
+                    continue
+            stack.append(_Frame(ch))
+            out.append(ch)
+            i += 1
+        elif ch in "}]":
+            if frame is not None:
+                if frame.kind == "{" and frame.expect != "key":
+                    # Key without a value: drop it
+                    del out[frame.member_start:]
+                out.append("}" if frame.kind == "{" else "]")
+                stack.pop()
+                end_value()
+            i += 1
+            if not stack:
+                break
+        elif ch == ":":
+            if frame is not None and frame.kind == "{" and frame.expect == "colon":
+                out.append(":")
+                frame.expect = "value"
+            i += 1
+        elif ch in "\"'":
+            value, i, closed = _read_string(text, i)
+            encoded = json.dumps(value, ensure_ascii=False)
+            if frame is not None and frame.kind == "{" and frame.expect == "key":
+                if not closed:
+                    break
+                begin_member(frame)
+                out.append(encoded)
+                frame.expect = "colon"
+            else:
+                place_value(encoded)
+            if not closed:
+                break
+        else:
+            # Bare word: unquoted key, literal, number or unquoted string value
+            stops = ":{}[]\n" if frame is not None and frame.kind == "{" and frame.expect == "key" else ",{}[]\n"
+            in_value = stops[0] == ","
+            end = i
+            while end < n and text[end] not in stops:
+                # A missing comma: `1 "b": 2` ends the value before the next quoted key or item
+                if in_value and text[end].isspace() and text[end:].lstrip()[:1] in ("\"", "'"):
+                    break
+                end += 1
+            token = text[i:end].strip()
+            if end >= n:
+                # Cut off mid-token: the value may be incomplete, so leave it out
+                break
+            i = end
+            if not token:
+                i += 1
+                continue
+            if frame is not None and frame.kind == "{" and frame.expect == "key":
+                begin_member(frame)
+                out.append(json.dumps(token.strip("\"'"), ensure_ascii=False))
+                frame.expect = "colon"
+            elif token in _LITERALS:
+                place_value(_LITERALS[token])
+            elif _NUMBER.match(token):
+                place_value(token)
+            else:
+                place_value(json.dumps(token, ensure_ascii=False))
+
+    truncated = bool(stack)
+    while stack:
+        frame = stack.pop()
+        if frame.kind == "{" and frame.expect != "key":
+            del out[frame.member_start:]
+        out.append("}" if frame.kind == "{" else "]")
+        end_value()
+
+    try:
+        return json.loads("".join(out)), truncated
+    except ValueError:
+        return None, False
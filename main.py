@@ -7,30 +7,24 @@ import re
 from uuid import uuid4
 import shutil
 from typing import List
-import PyPDF2
-import docx
 import time
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-# from langchain_pinecone import PineconeVectorStore
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+import threading
+# Heavy libraries used by a single route (PyPDF2, docx, PIL, langchain_openai, pinecone,
+# langchain text splitters) are imported where they are used, to keep worker cold starts short
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, SystemMessage
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
 from pydantic import EmailStr
-import uvicorn
 import asyncio
-from PIL import Image
 from io import BytesIO
-import aiohttp
 from typing import Dict, Tuple
 import io
 import base64
-from openai import OpenAI
-from fastapi import FastAPI, Depends, HTTPException, status
+import secrets
+import json
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt, JWTError
@@ -38,30 +32,49 @@ from passlib.context import CryptContext
 from pydantic import BaseModel
 from model import (
     UserDB, UserCreate, User, Token, ContactDB, ContactCreate, ContactResponse,PromptCreate, PromptResponse,PromptDB,
-    get_db, create_tables, BreadSession, RecipeSession
+    SessionLocal, get_db, replica_engine, BreadSession, RecipeSession
 )
+from read_routing import read_session, recent_writes
+from keyword_matcher import KeywordMatcher
+from state_store import StateStore, dump_messages, load_messages, shared_backend
+from session_store import StaleSessionError
+from sweeper import run_sweeper
+from migrations import check_schema
+from sql_metrics import SQL_METRICS, SQL_METRICS_HEADERS, sql_metrics, track_request
+from db_pool import pool_metrics
+from llm import GENERATION, chat_completion, close_async_client, get_http_client, get_scheduler, parse_json_content, timeout_for, with_retries
 from tool_calling import (pizza_intro, get_pizza_experience_response, get_dietary_response, get_dough_quantity_response, get_pizza_weight_response, get_hydration_response,
                           get_flour_type_response, get_yeast_type_response, get_room_temperature_response, get_kneading_method_response, get_oven_type_response,
                           get_final_confirmation_response, get_step_by_step_start_response, get_fermentation_time_response)
 
 
-llm = ChatOpenAI()
-llm_with_tools = llm.bind_tools([
-    pizza_intro,
-    get_pizza_experience_response,
-    get_dietary_response,
-    get_dough_quantity_response,
-    get_pizza_weight_response,
-    get_hydration_response,
-    get_flour_type_response,
-    get_yeast_type_response,
-    get_room_temperature_response,
-    get_final_confirmation_response,
-    get_kneading_method_response,
-    get_oven_type_response,
-    get_step_by_step_start_response,
-    get_fermentation_time_response
-])
+_llm_with_tools = None
+
+
+def get_llm_with_tools():
+    """Tool-calling chat model for /ask/, created on first use"""
+    global _llm_with_tools
+    if _llm_with_tools is None:
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(http_async_client=get_http_client(), max_retries=0, timeout=timeout_for("gpt-3.5-turbo"))
+        _llm_with_tools = llm.bind_tools([
+            pizza_intro,
+            get_pizza_experience_response,
+            get_dietary_response,
+            get_dough_quantity_response,
+            get_pizza_weight_response,
+            get_hydration_response,
+            get_flour_type_response,
+            get_yeast_type_response,
+            get_room_temperature_response,
+            get_final_confirmation_response,
+            get_kneading_method_response,
+            get_oven_type_response,
+            get_step_by_step_start_response,
+            get_fermentation_time_response
+        ])
+    return _llm_with_tools
 
 # Tool registry
 tool_registry = {
@@ -98,7 +111,6 @@ PIZZA_KEYWORDS = {
 }
 
 
-create_tables()
 app = FastAPI(title="Document Q&A API")
 
 app.add_middleware(
@@ -109,7 +121,91 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+
+@app.exception_handler(StaleSessionError)
+async def stale_session_handler(request, exc: StaleSessionError):
+    # The session was changed by a concurrent request; nothing from this turn was saved
+    return JSONResponse(status_code=409, content={
+        "status": "conflict",
+        "message": "This conversation was updated by another request. Please review the current state and answer again.",
+        "session_id": exc.session_id,
+        "answers": exc.answers,
+    })
+
+
+if SQL_METRICS:
+    @app.middleware("http")
+    async def sql_stats_middleware(request, call_next):
+        with track_request() as stats:
+            response = await call_next(request)
+        route = request.scope.get("route")
+        sql_metrics.record_request(f"{request.method} {route.path if route else request.url.path}", stats)
+        if SQL_METRICS_HEADERS:
+            response.headers["X-DB-Queries"] = str(stats.queries)
+            response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000:.1f}"
+        return response
+
+
+# GET /metrics exposes SQL text and pool internals, so it needs `Authorization: Bearer <METRICS_TOKEN>`.
+# Without a token configured the endpoint is disabled
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    from newbread import slot_stats
+    return {
+        "sql": sql_metrics.snapshot(),
+        "db_pool": pool_metrics.snapshot(),
+        "llm_queues": get_scheduler().stats(),
+        "bread_slot_extraction": dict(slot_stats),
+    }
+
+
+# Warm the Pinecone / embeddings clients in the background after startup instead of on the first upload
+PRELOAD_CLIENTS = os.getenv("PRELOAD_CLIENTS", "false").lower() == "true"
+DB_SETUP_RETRY_SECONDS = 5
+
+
+async def setup_database():
+    """Check the schema version (migrating if enabled), retrying until it is usable, then start the sweeper"""
+    while True:
+        try:
+            if await check_schema():
+                break
+        except Exception as e:
+            print(f"[{datetime.now()}] Database setup failed, retrying in {DB_SETUP_RETRY_SECONDS}s: {e}")
+        await asyncio.sleep(DB_SETUP_RETRY_SECONDS)
+    app.state.db_ready = True
+    # Expire idle sessions and conversation state in the background
+    app.state.sweeper = asyncio.create_task(run_sweeper([state_backend]))
+
+
+@app.on_event("startup")
+async def init_db():
+    # Nothing here waits on the network, so the worker serves /health immediately; /ready reports when the DB is set up
+    app.state.db_ready = False
+    app.state.sweeper = None
+    app.state.db_setup = asyncio.create_task(setup_database())
+    if PRELOAD_CLIENTS:
+        app.state.preload = asyncio.create_task(asyncio.to_thread(get_vectorstore))
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    app.state.db_setup.cancel()
+    if app.state.sweeper is not None:
+        app.state.sweeper.cancel()
+    await close_async_client()
+    await state_backend.close()
 
 os.makedirs("uploads", exist_ok=True)
 
@@ -122,25 +218,41 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "pcsk_W5Yz5_nkXMKQGgzAeVfD85CXpqzivXzctr2tfju4e4AmRX4EuYEGSDJYhotiMVxpb7MV")
 INDEX_NAME = "image-qa-index"
-client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-
-if INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=1536,  # OpenAI embeddings dimension
-        metric='cosine',
-        spec=ServerlessSpec(
-            cloud='aws',
-            region='us-east-1'
-        )
-    )
-    # Wait for index to be ready
-    while not pc.describe_index(INDEX_NAME).status["ready"]:
-        time.sleep(1)
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+
 
-index = pc.Index(INDEX_NAME)
+def get_vectorstore():
+    """Pinecone index (created if missing) behind a LangChain vector store, set up on first use
+
+    Blocking: call it from a worker thread (asyncio.to_thread).
+    """
+    global _vectorstore
+    with _vectorstore_lock:
+        if _vectorstore is None:
+            from langchain_openai import OpenAIEmbeddings
+            from langchain_pinecone import PineconeVectorStore
+            from pinecone import Pinecone, ServerlessSpec
+
+            pc = Pinecone(api_key=PINECONE_API_KEY)
+            if INDEX_NAME not in pc.list_indexes().names():
+                pc.create_index(
+                    name=INDEX_NAME,
+                    dimension=1536,  # OpenAI embeddings dimension
+                    metric='cosine',
+                    spec=ServerlessSpec(
+                        cloud='aws',
+                        region='us-east-1'
+                    )
+                )
+                # Wait for index to be ready
+                while not pc.describe_index(INDEX_NAME).status["ready"]:
+                    time.sleep(1)
+            _vectorstore = PineconeVectorStore(
+                index=pc.Index(INDEX_NAME),
+                embedding=OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+            )
+    return _vectorstore
 
 SECRET_KEY = "your-secret-key-here"  
 ALGORITHM = "HS256"
@@ -149,24 +261,20 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-vectorstore = PineconeVectorStore(
-    index=index,
-    embedding=embeddings
-)
+_text_splitter = None
 
-llm = ChatOpenAI(temperature=0, model_name="gpt-4o-mini", openai_api_key=OPENAI_API_KEY)
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-    length_function=len,
-)
+def get_text_splitter():
+    global _text_splitter
+    if _text_splitter is None:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True
-)
+        _text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+        )
+    return _text_splitter
 
 
 def verify_password(plain_password, hashed_password):
@@ -185,7 +293,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -199,14 +307,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
         
-    user = db.query(UserDB).filter(UserDB.email == email).first()
+    query = select(UserDB).where(UserDB.email == email)
+    async with read_session(email) as db:
+        user = (await db.execute(query)).scalars().first()
+    if user is None and replica_engine is not None:
+        # Signed up moments ago through another worker: the replica may not have the row yet
+        async with SessionLocal() as db:
+            user = (await db.execute(query)).scalars().first()
     if user is None:
         raise credentials_exception
     return user
 
 
-document_store = {} 
-conversation_store = {}  
+# Conversation state lives in the configured backend (STATE_BACKEND) so any worker can serve any turn
+state_backend = shared_backend()
+document_store = StateStore("documents", state_backend)
+conversation_store = StateStore("ask", state_backend)  # /ask/ chat histories (compact LangChain messages)
  
 
 def extract_pizza_type(question: str) -> str:
@@ -219,18 +335,22 @@ def extract_pizza_type(question: str) -> str:
 
 def process_pdf(file_path: str) -> List[str]:
     """Extract text from PDF and split into chunks."""
+    import PyPDF2
+
     with open(file_path, 'rb') as file:
         pdf_reader = PyPDF2.PdfReader(file)
         text = ""
         for page in pdf_reader.pages:
             text += page.extract_text() or ""  # Handle NoneType if page text is empty
-    return text_splitter.split_text(text)
+    return get_text_splitter().split_text(text)
 
 def process_docx(file_path: str) -> List[str]:
     """Extract text from DOCX and split into chunks."""
+    import docx
+
     doc = docx.Document(file_path)
     text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-    return text_splitter.split_text(text)
+    return get_text_splitter().split_text(text)
 
 
 
@@ -554,6 +674,8 @@ def detect_language(query: str) -> str:
 
 async def compress_image(image_data: bytes) -> str:
     """Compress image more aggressively for faster processing"""
+    from PIL import Image
+
     try:
         img = Image.open(BytesIO(image_data))
         if img.mode == 'RGBA':
@@ -574,103 +696,8 @@ async def compress_image(image_data: bytes) -> str:
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Image processing error: {str(e)}")
 
-# async def analyze_pizza(session: aiohttp.ClientSession, base64_image: str, language: str) -> Tuple[str, str]:
-#     """Analyze pizza and generate recipe in specified language"""
-#     headers = {
-#         "Content-Type": "application/json",
-#         "Authorization": f"Bearer {OPENAI_API_KEY}"
-#     }
-    
-#     try:
-        
-#         dough_recipes = DOUGH_RECIPE_LANGUAGE_MAP.get(language, BASE_DOUGH_RECIPES_EN)
-#         selected_dough = dough_recipes.get(dough_type, dough_recipes['napoletana_imperatore'])
-#         analysis_prompt = ANALYSIS_TEMPLATES.get(language, ANALYSIS_TEMPLATES['English'])
-        
-#         analysis_payload = {
-#             "model": "gpt-4-turbo",
-#             "messages": [
-#                 {
-#                     "role": "user",
-#                     "content": [
-#                         {"type": "text", "text": analysis_prompt},
-#                         {
-#                             "type": "image_url",
-#                             "image_url": {
-#                                 "url": f"data:image/jpeg;base64,{base64_image}"
-#                             }
-#                         }
-#                     ]
-#                 }
-#             ],
-#             "max_tokens": 150  
-#         }
-
-#         async with session.post(
-#             "https://api.openai.com/v1/chat/completions",
-#             headers=headers,
-#             json=analysis_payload,
-#             timeout=10
-#         ) as response:
-#             analysis_data = await response.json()
-#             if response.status != 200:
-#                 raise HTTPException(status_code=response.status, detail="Analysis failed")
-            
-#             analysis = analysis_data['choices'][0]['message']['content']
-
-#             words = analysis.split()
-#             if len(words) > 100:
-#                 analysis = ' '.join(words[:100])
-#                 if not analysis.endswith('.'):
-#                     analysis += '.'
-            
-#             # Second API call for recipe
-#             recipe_prompt = RECIPE_TEMPLATES.get(language, RECIPE_TEMPLATES['English']).format(
-#                 analysis=analysis,
-#                 dough_title=selected_dough['title']
-#                 )
-#             dough_ingredients = ', '.join(selected_dough['ingredients'])
-#             dough_instructions = ' '.join(selected_dough['instructions'])
-            
-#             recipe_payload = {
-#                 "model": "gpt-3.5-turbo",
-#                 "messages": [
-#                     {
-#                         "role": "user",
-#                         # "content": recipe_prompt
-#                         "content": f"You are creating a pizza recipe. For the dough base, use this authentic recipe: {selected_dough['title']}. Ingredients: {dough_ingredients}. Instructions: {dough_instructions}"
-
-#                     }
-#                 ],
-#                 "max_tokens": 250,
-#                 "temperature": 0.7,
-#                 "presence_penalty": 0.6
-#             }
-
-#             async with session.post(
-#                 "https://api.openai.com/v1/chat/completions",
-#                 headers=headers,
-#                 json=recipe_payload,
-#                 timeout=8
-#             ) as recipe_response:
-#                 recipe_data = await recipe_response.json()
-#                 if recipe_response.status != 200:
-#                     raise HTTPException(status_code=recipe_response.status, detail="Recipe generation failed")
-                
-#                 recipe = recipe_data['choices'][0]['message']['content']
-                
-#                 return analysis, recipe, selected_dough
-
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=str(e))
-
-async def analyze_pizza(session: aiohttp.ClientSession, base64_image: str, language: str, dough_type: str = 'napoletana_imperatore') -> Tuple[str, str, dict]:
+async def analyze_pizza(base64_image: str, language: str, dough_type: str = 'napoletana_imperatore') -> Tuple[str, str, dict]:
     """Analyze pizza and generate recipe in specified language with authentic dough base"""
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {OPENAI_API_KEY}"  # Assuming OPENAI_API_KEY is defined elsewhere
-    }
-    
     try:
         # Get the appropriate dough recipe based on language
         dough_recipes = DOUGH_RECIPE_LANGUAGE_MAP.get(language, BASE_DOUGH_RECIPES_EN)
@@ -678,9 +705,8 @@ async def analyze_pizza(session: aiohttp.ClientSession, base64_image: str, langu
         
         analysis_prompt = ANALYSIS_TEMPLATES.get(language, ANALYSIS_TEMPLATES['English'])
         
-        analysis_payload = {
-            "model": "gpt-4-turbo",
-            "messages": [
+        analysis = await chat_completion(
+            [
                 {
                     "role": "user",
                     "content": [
@@ -694,79 +720,59 @@ async def analyze_pizza(session: aiohttp.ClientSession, base64_image: str, langu
                     ]
                 }
             ],
-            "max_tokens": 150  
-        }
-
-        async with session.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=analysis_payload,
+            model="gpt-4-turbo",
+            temperature=1.0,
+            max_tokens=150,
             timeout=10
-        ) as response:
-            analysis_data = await response.json()
-            if response.status != 200:
-                raise HTTPException(status_code=response.status, detail="Analysis failed")
-            
-            analysis = analysis_data['choices'][0]['message']['content']
-
-            words = analysis.split()
-            if len(words) > 100:
-                analysis = ' '.join(words[:100])
-                if not analysis.endswith('.'):
-                    analysis += '.'
-            
-            # Second API call for recipe, now including dough information
-            recipe_prompt = RECIPE_TEMPLATES.get(language, RECIPE_TEMPLATES['English']).format(
-                analysis=analysis,
-                dough_title=selected_dough['title']
-            )
-            
-            # Include dough recipe details as system message
-            dough_ingredients = ', '.join(selected_dough['ingredients'])
-            dough_instructions = ' '.join(selected_dough['instructions'])
-            
-            recipe_payload = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": f"You are creating a pizza recipe. For the dough base, use this authentic recipe: {selected_dough['title']}. Ingredients: {dough_ingredients}. Instructions: {dough_instructions}"
-                    },
-                    {
-                        "role": "user",
-                        "content": recipe_prompt
-                    }
-                ],
-                "max_tokens": 250,  # Increased max tokens to accommodate dough details
-                "temperature": 0.7,
-                "presence_penalty": 0.6
-            }
+        )
 
-            async with session.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=recipe_payload,
-                timeout=8
-            ) as recipe_response:
-                recipe_data = await recipe_response.json()
-                if recipe_response.status != 200:
-                    raise HTTPException(status_code=recipe_response.status, detail="Recipe generation failed")
-                
-                recipe = recipe_data['choices'][0]['message']['content']
-                
-                return analysis, recipe, selected_dough
+        words = analysis.split()
+        if len(words) > 100:
+            analysis = ' '.join(words[:100])
+            if not analysis.endswith('.'):
+                analysis += '.'
+        
+        # Second API call for recipe, now including dough information
+        recipe_prompt = RECIPE_TEMPLATES.get(language, RECIPE_TEMPLATES['English']).format(
+            analysis=analysis,
+            dough_title=selected_dough['title']
+        )
+        
+        # Include dough recipe details as system message
+        dough_ingredients = ', '.join(selected_dough['ingredients'])
+        dough_instructions = ' '.join(selected_dough['instructions'])
+        
+        recipe = await chat_completion(
+            [
+                {
+                    "role": "system",
+                    "content": f"You are creating a pizza recipe. For the dough base, use this authentic recipe: {selected_dough['title']}. Ingredients: {dough_ingredients}. Instructions: {dough_instructions}"
+                },
+                {
+                    "role": "user",
+                    "content": recipe_prompt
+                }
+            ],
+            model="gpt-3.5-turbo",
+            temperature=0.7,
+            max_tokens=250,  # Increased max tokens to accommodate dough details
+            presence_penalty=0.6,
+            timeout=8
+        )
+        
+        return analysis, recipe, selected_dough
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/signup", response_model=Token)
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
  
     print(f"[{datetime.now()}] Called /signup")
     print(f"Payload: user={user}, db={db}")
 
-    db_user = db.query(UserDB).filter(UserDB.email == user.email).first()
+    db_user = (await db.execute(select(UserDB).where(UserDB.email == user.email))).scalars().first()
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -782,8 +788,9 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    await recent_writes.note(user.email)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -797,13 +804,13 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
 async def login(
     email: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     
     print(f"[{datetime.now()}] Called /login")
     print(f"Payload: email={email}, password={password}, db={db}")
     # Find user by email
-    user = db.query(UserDB).filter(UserDB.email == email).first()
+    user = (await db.execute(select(UserDB).where(UserDB.email == email))).scalars().first()
     
     if not user:
         raise HTTPException(
@@ -833,7 +840,7 @@ async def login(
     }
 
 @app.post("/admin-login")
-async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     
     
     print(f"[{datetime.now()}] Called /admin-login")
@@ -888,8 +895,9 @@ async def upload_file(file: UploadFile = File(...)):
             return {"error": "Unsupported file format. Please upload PDF or DOCX files only."}
 
         document_id = file.filename  # Using filename as a unique document ID
-        document_store[document_id] = " ".join(chunks)  # Store text in memory
-        vectorstore.add_texts(chunks)
+        await document_store.set(document_id, " ".join(chunks))
+        vectorstore = await asyncio.to_thread(get_vectorstore)
+        await asyncio.to_thread(vectorstore.add_texts, chunks)
 
         # Clean up the uploaded file
         os.remove(file_path)
@@ -909,7 +917,7 @@ async def start_conversation():
 
 
     conversation_id = str(uuid4())
-    conversation_store[conversation_id] = [] 
+    await conversation_store.set(conversation_id, [])
     return {"conversation_id": conversation_id}
 
 
@@ -1240,7 +1248,7 @@ def format_experience_question(language: str) -> str:
     language_code = language.lower()[:2]
     return experience_questions.get(language_code, experience_questions["en"])
 
-def get_dough_recipe(question: str, language: str, experience_level: str = "Beginner") -> str:
+async def get_dough_recipe(question: str, language: str, experience_level: str = "Beginner") -> str:
     """
     Returns a detailed, well-formatted dough recipe based on the question and language.
     
@@ -1284,20 +1292,19 @@ def get_dough_recipe(question: str, language: str, experience_level: str = "Begi
     # Send to OpenAI to get customized recipe with the improved prompt
     system_message = get_pizza_system_prompt(language)
     
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo-16k",
-        messages=[
+    return await chat_completion(
+        [
             {"role": "system", "content": system_message},
             {"role": "user", "content": f"I want a recipe for {pizza_type} pizza dough. My experience level is {experience_level}. Please respond in {language}."},
             {"role": "system", "content": recipe_prompt}
         ],
+        model="gpt-3.5-turbo-16k",
         temperature=0.7,  # Slightly lower temperature for more consistent responses
         max_tokens=1200,  # Increased for complete recipes
+        priority=GENERATION,
         presence_penalty=0.5,
         frequency_penalty=0.5
     )
-    
-    return response.choices[0].message.content
 
 def is_asking_for_recipe(question: str) -> bool:
     """
@@ -1312,7 +1319,7 @@ def is_asking_for_recipe(question: str) -> bool:
     recipe_keywords = ["recipe", "how to make", "how do i make", "dough", "ingredients", "instructions"]
     return any(keyword in question.lower() for keyword in recipe_keywords)
 
-def get_conversation_state(conversation_id: str) -> dict:
+async def get_conversation_state(conversation_id: str) -> dict:
     """
     Gets the current state of the conversation.
     
@@ -1322,11 +1329,11 @@ def get_conversation_state(conversation_id: str) -> dict:
     Returns:
         dict: Conversation state
     """
-    if not conversation_id or conversation_id not in conversation_store:
+    history = await conversation_store.get(conversation_id) if conversation_id else None
+    if history is None:
         return {"phase": "greeting", "experience_level": None, "pizza_type": None}
     
     # Check conversation history to determine state
-    history = conversation_store[conversation_id]
     if not history:
         return {"phase": "greeting", "experience_level": None, "pizza_type": None}
     
@@ -1565,9 +1572,12 @@ async def ask_question(
     language_name = LANGUAGE_MAP.get(language_code, "English")
     default_language_code = "en"
 
-    if conversation_id not in conversation_store:
+    stored = await conversation_store.get(conversation_id)
+    if stored is not None:
+        history = load_messages(stored)
+    else:
         # Start new session with a system message
-        conversation_store[conversation_id] = [
+        history = [
             SystemMessage(content=(
                 f""" 
         You are a professional Italian pizza maker with many years of hands-on experience in creating traditional Neapolitan pizzas and their variations. You are passionate, friendly, and highly skilled, like a true maestro who is both a craftsman and a teacher. Your role is to teach students how to make the perfect pizza, from selecting the ingredients to managing the dough’s leavening and mastering oven baking techniques.
@@ -1656,12 +1666,12 @@ async def ask_question(
         ]
 
     # Append user input
-    conversation_store[conversation_id].append(HumanMessage(content=question))
+    history.append(HumanMessage(content=question))
 
     try:
         # LLM generates response
-        ai_response = llm_with_tools.invoke(conversation_store[conversation_id])
-        conversation_store[conversation_id].append(ai_response)
+        ai_response = await with_retries(lambda: get_llm_with_tools().ainvoke(history))
+        history.append(ai_response)
 
         tool_responses = []
 
@@ -1678,7 +1688,7 @@ async def ask_question(
                         "tool_name": tool_name,
                         "tool_response": result
                     })
-                    conversation_store[conversation_id].append(
+                    history.append(
                         ToolMessage(tool_call_id=tool_call["id"], content=result)
                     )
 
@@ -1690,6 +1700,8 @@ async def ask_question(
         import traceback
         traceback.print_exc()
         return {"error": str(e)}
+    finally:
+        await conversation_store.set(conversation_id, dump_messages(history))
 
 
 
@@ -1712,20 +1724,19 @@ async def upload_pizza_image(
         base64_image = await compress_image(image_data)
         
         # Get analysis, recipe, and dough info
-        async with aiohttp.ClientSession() as session:
-            analysis, recipe, dough_info = await analyze_pizza(session, base64_image, lang, dough_type)
-            
-            return {
-                "success": True,
-                "language": lang,
-                "analysis": analysis,
-                "recipe": recipe,
-                "dough": {
-                    "title": dough_info['title'],
-                    "ingredients": dough_info['ingredients'],
-                    "instructions": dough_info['instructions']
-                }
+        analysis, recipe, dough_info = await analyze_pizza(base64_image, lang, dough_type)
+        
+        return {
+            "success": True,
+            "language": lang,
+            "analysis": analysis,
+            "recipe": recipe,
+            "dough": {
+                "title": dough_info['title'],
+                "ingredients": dough_info['ingredients'],
+                "instructions": dough_info['instructions']
             }
+        }
 
     except HTTPException as e:
         return {"error": str(e.detail)}
@@ -1740,13 +1751,14 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 # API to Create a Contact with Image Upload
 @app.post("/contacts/", response_model=ContactResponse)
 async def create_contact(
+    request: Request,
     name: str = Form(...),
     email: EmailStr = Form(...),
     company: str = Form(None),
     collaborator: str = Form(None),
     message: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     print(f"[{datetime.now()}] Called /contacts")
     print(f"Payload: name={name}, email={email}, company={company}, collaborator={collaborator}, message={message}, db={db}")
@@ -1770,21 +1782,103 @@ async def create_contact(
     )
 
     db.add(new_contact)
-    db.commit()
-    db.refresh(new_contact)
+    await db.commit()
+    await db.refresh(new_contact)
+    # A listing sent with the same X-Session-Id reads from the primary until the replica has this contact
+    await recent_writes.note(request.headers.get("X-Session-Id"))
 
     return new_contact
 
-@app.get("/contacts/", response_model=list[ContactResponse])
-def get_contacts(db: Session = Depends(get_db)):
+async def get_read_db(request: Request):
+    """Read-only counterpart of get_db; the X-Session-Id header or session_id query parameter opts into read-your-writes"""
+    key = request.headers.get("X-Session-Id") or request.query_params.get("session_id")
+    async with read_session(key) as db:
+        yield db
+
+
+# --- Contact listing: keyset pagination on (created_at, id), newest first ---
+CONTACTS_PAGE_SIZE = int(os.getenv("CONTACTS_PAGE_SIZE", "100"))
+CONTACTS_MAX_PAGE_SIZE = int(os.getenv("CONTACTS_MAX_PAGE_SIZE", "1000"))
+CONTACTS_EXPORT_BATCH_SIZE = int(os.getenv("CONTACTS_EXPORT_BATCH_SIZE", "500"))
+
+
+def encode_contacts_cursor(contact) -> str:
+    raw = json.dumps([contact.created_at.isoformat(), contact.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
 
+def decode_contacts_cursor(cursor: str):
+    try:
+        created_at, contact_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(contact_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def contacts_query(email=None, company=None, collaborator=None, created_from=None, created_to=None, cursor=None):
+    """SELECT for the contacts matching the filters, after `cursor`, served by ix_contact_created_at_id"""
+    query = select(ContactDB)
+    if email:
+        query = query.where(ContactDB.email == email)
+    if company:
+        query = query.where(ContactDB.company == company)
+    if collaborator:
+        query = query.where(ContactDB.collaborator == collaborator)
+    if created_from:
+        query = query.where(ContactDB.created_at >= created_from)
+    if created_to:
+        query = query.where(ContactDB.created_at < created_to)
+    if cursor:
+        query = query.where(tuple_(ContactDB.created_at, ContactDB.id) < tuple_(*decode_contacts_cursor(cursor)))
+    return query.order_by(ContactDB.created_at.desc(), ContactDB.id.desc())
+
+
+@app.get("/contacts/", response_model=list[ContactResponse])
+async def get_contacts(
+    response: Response,
+    limit: int = Query(CONTACTS_PAGE_SIZE, ge=1, le=CONTACTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    email: Optional[str] = None,
+    company: Optional[str] = None,
+    collaborator: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """One page of contacts, newest first; pass the X-Next-Cursor header back as `cursor` for the next page"""
     print(f"[{datetime.now()}] Called /contacts get method")
-    print(f"Payload: db={db}")
+    print(f"Payload: limit={limit}, cursor={cursor}, email={email}, company={company}, collaborator={collaborator}")
 
-    contacts = db.query(ContactDB).all()
+    query = contacts_query(email, company, collaborator, created_from, created_to, cursor)
+    contacts = (await db.execute(query.limit(limit + 1))).scalars().all()
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        response.headers["X-Next-Cursor"] = encode_contacts_cursor(contacts[-1])
     return contacts
 
 
+@app.get("/contacts/export")
+async def export_contacts(
+    email: Optional[str] = None,
+    company: Optional[str] = None,
+    collaborator: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Every matching contact as NDJSON, read through a server-side cursor in constant memory"""
+    print(f"[{datetime.now()}] Called /contacts/export")
+    query = contacts_query(email, company, collaborator, created_from, created_to)
+
+    async def rows():
+        # Own session: the stream outlives the request's dependencies
+        async with read_session() as db:
+            result = await db.stream(query.execution_options(yield_per=CONTACTS_EXPORT_BATCH_SIZE))
+            async for contact in result.scalars():
+                yield ContactResponse.model_validate(contact).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
 
 QUESTIONS = {
     "en": [
@@ -1826,7 +1920,7 @@ QUESTIONS = {
 }
 
 # Store conversation history using a simple ID generation system instead of user-provided session IDs
-conversations = {}
+conversations = StateStore("pinochat", state_backend)
 
 # Define request and response models
 class ChatRequest(BaseModel):
@@ -1857,12 +1951,12 @@ async def start_conversation(request: StartChatRequest):
         raise HTTPException(status_code=400, detail="Unsupported language. Use 'en', 'de', 'fr', or 'it'.")
     
     conversation_id = str(uuid.uuid4())
-    conversations[conversation_id] = {
+    await conversations.set(conversation_id, {
         'answers': [],
         'current_question': 0,
         'completed': False,
         'language': request.language
-    }
+    })
     
     return {
         'conversation_id': conversation_id,
@@ -1881,11 +1975,10 @@ async def chat(request: ChatRequest):
     user_answer = request.message
     language = request.language
     
-    if not conversation_id or conversation_id not in conversations:
+    conversation = await conversations.get(conversation_id) if conversation_id else None
+    if conversation is None:
         raise HTTPException(status_code=400, detail="Invalid conversation ID. Please start a new conversation.")
     
-    conversation = conversations[conversation_id]
-    
     # Store the user's answer
     conversation['answers'].append(user_answer)
     
@@ -1894,7 +1987,10 @@ async def chat(request: ChatRequest):
     
     if conversation['current_question'] >= len(QUESTIONS[language]):
         conversation['completed'] = True
-        recipe = generate_recipe(conversation['answers'], language)
+    await conversations.set(conversation_id, conversation)
+    
+    if conversation['completed']:
+        recipe = await generate_recipe(conversation['answers'], language)
         return {
             'conversation_id': conversation_id,
             'message': recipe,
@@ -1909,7 +2005,7 @@ async def chat(request: ChatRequest):
         'total_questions': len(QUESTIONS[language])
     }
 
-def generate_recipe(answers, language):
+async def generate_recipe(answers, language):
 
     language_mapping = {
         "en": "English",
@@ -1962,18 +2058,16 @@ def generate_recipe(answers, language):
     - Total: XX min
     """
 
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
+    recipe = await chat_completion(
+        [
             {"role": "system", "content": "You are Pino, a professional chef specialized in creating personalized recipes. Your recipes must EXACTLY match the user's requirements, using ONLY the ingredients they have available and respecting ALL dietary restrictions. Your recipes should be precise, detailed, and executable."},
             {"role": "user", "content": prompt}
         ],
+        model="gpt-3.5-turbo",
         temperature=0.3,
         max_tokens=500,
+        priority=GENERATION,
     )
-
-
-    recipe = response.choices[0].message.content
     
     # Remove markdown formatting (# and * characters)
     recipe = re.sub(r'[#*_]{1,3}\s?|\s?[#*_]{1,3}', '', recipe)
@@ -1983,12 +2077,12 @@ def generate_recipe(answers, language):
 @app.post("/prompt", response_model=PromptCreate)
 async def create_or_update_prompt(
     prompt: PromptCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     print(f"[{datetime.now()}] Called /prompt")
     print(f"Payload: prompt={prompt}, db={db}")
     try:
-        existing_prompt = db.query(PromptDB).first()
+        existing_prompt = (await db.execute(select(PromptDB))).scalars().first()
 
         if existing_prompt:
             existing_prompt.content = prompt.content
@@ -1997,13 +2091,13 @@ async def create_or_update_prompt(
             db.add(existing_prompt)
 
         # Commit changes
-        db.commit()
-        db.refresh(existing_prompt)
+        await db.commit()
+        await db.refresh(existing_prompt)
 
         return existing_prompt
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     
 
@@ -2011,7 +2105,20 @@ async def create_or_update_prompt(
 async def health_check():
     print(f"[{datetime.now()}] Called /health")
     print(f"Payload: none")
-    return {"status": "healthy"}
+    return {"status": "healthy", "worker": os.getpid(), "llm_queues": get_scheduler().stats()}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness (unlike /health, which only says the process is alive): schema set up and the database answering"""
+    if not app.state.db_ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "database": "setting up"})
+    try:
+        async with SessionLocal() as db:
+            await asyncio.wait_for(db.execute(text("SELECT 1")), timeout=2)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "database": str(e)})
+    return {"status": "ready", "vectorstore": "ready" if _vectorstore is not None else "on first use"}
 
 
 
@@ -2062,111 +2169,103 @@ def _normalize_mode(text: str) -> Optional[str]:
     return None
 
 
-def _extract_bread_answers_freeform(text: str) -> dict:
-    # Minimal heuristic extraction; GPT step will refine when generating the final recipe
-    t = text.strip()
-    extracted = {}
-    mode = _normalize_mode(t)
-    if mode:
-        extracted["mode"] = mode
-    # Very light hints
-    if any(k in t.lower() for k in ["beginner", "intermediate", "expert"]):
-        for k in ["beginner", "intermediate", "expert"]:
-            if k in t.lower():
-                extracted["experience"] = k
-                break
-    bread_hints = ["rustic", "whole wheat", "baguette", "focaccia", "sandwich"]
-    for b in bread_hints:
-        if b in t.lower():
-            extracted["bread_type"] = b
-            break
-    # Flours
-    flours = [
+# Keywords of the freeform bread extractor, compiled once; values are listed best first
+BREAD_FREEFORM_MATCHER = KeywordMatcher({
+    "experience": {"beginner": "beginner", "intermediate": "intermediate", "expert": "expert"},
+    "bread_type": {b: b for b in ["rustic", "whole wheat", "baguette", "focaccia", "sandwich"]},
+    "flours": {f: True for f in [
         "all-purpose", "00", "bread flour", "type 0", "0 flour", "whole wheat",
         "manitoba", "multigrain", "mix", "mixes"
-    ]
-    if any(f in t.lower() for f in flours):
-        extracted["flours"] = t
-    # Leavening
-    leavening_map = {
+    ]},
+    "leavening": {
         "fresh": "fresh yeast",
         "dry": "dry yeast",
         "sourdough": "sourdough starter",
         "liquid starter": "liquid starter",
         "none": "none",
         "no yeast": "none"
-    }
-    tl = t.lower()
-    for k, v in leavening_map.items():
-        if k in tl:
-            extracted["leavening"] = v
-            break
+    },
     # Equipment (kneading + baking)
-    equipment_keywords = [
+    "equipment": {k: True for k in [
         "hand kneading", "hand", "stand mixer", "mixer", "planetary",
         "oven", "convection", "static", "baking stone", "pizza stone", "baking steel",
         "dutch oven", "cast iron", "tray", "sheet"
-    ]
-    if any(k in tl for k in equipment_keywords):
+    ]},
+    "few_hours": {x: "few hours" for x in ["few hours", "couple of hours", "several hours"]},
+    "dietary_unsure": {x: "unsure" for x in ["i don't know", "dont know", "idk", "not sure", "unsure"]},
+    "dietary": {
+        "vegan": "vegan",
+        "vegetarian": "vegetarian",
+        "gluten-free": "gluten-free",
+        "gluten free": "gluten-free",
+        "none": "none"
+    },
+    "format": {"step-by-step": "step-by-step", "step by step": "step-by-step", "compact": "compact", "mixed": "mixed"},
+})
+BREAD_FERMENTATION_HOURS = [8, 12, 24, 48]
+BREAD_HOURS_RE = re.compile(r"\b(8|12|24|48)\s*h(?:ours)?\b")
+ROOM_TEMP_C_RE = re.compile(r"(\d{1,2})\s*°?\s*c")
+ROOM_TEMP_F_RE = re.compile(r"(\d{2,3})\s*°?\s*f")
+AMOUNT_G_RE = re.compile(r"(\d{2,5})\s*g(ram)?s?")
+AMOUNT_KG_RE = re.compile(r"(\d(?:\.\d+)?)\s*kg")
+AMOUNT_LOAVES_RE = re.compile(r"(\d+)\s*(loaves?|rolls?)")
+NEGATIVE_ANSWER_RE = re.compile(r"^\s*(no|none|nope|nothing)\s*$")
+
+
+def _extract_bread_answers_freeform(text: str) -> dict:
+    # Minimal heuristic extraction; GPT step will refine when generating the final recipe
+    t = text.strip()
+    tl = t.lower()
+    extracted = {}
+    mode = _normalize_mode(t)
+    if mode:
+        extracted["mode"] = mode
+    found = BREAD_FREEFORM_MATCHER.match(tl)
+    # Very light hints
+    for field in ("experience", "bread_type", "leavening"):
+        if field in found:
+            extracted[field] = found[field][0]
+    # Flours and equipment keep the user's own wording
+    if "flours" in found:
+        extracted["flours"] = t
+    if "equipment" in found:
         extracted["equipment"] = t
     # Fermentation time
-    import re as _re
-    if any(x in tl for x in ["few hours", "couple of hours", "several hours"]):
+    if "few_hours" in found:
         extracted["fermentation_time"] = "few hours"
-    for h in [8, 12, 24, 48]:
-        if _re.search(fr"\b{h}\s*h(ours)?\b", tl):
+    hours = {int(h) for h in BREAD_HOURS_RE.findall(tl)}
+    for h in BREAD_FERMENTATION_HOURS:
+        if h in hours:
             extracted["fermentation_time"] = f"{h}h"
             break
     # Room temperature
-    m_c = _re.search(r"(\d{1,2})\s*°?\s*c", tl)
-    m_f = _re.search(r"(\d{2,3})\s*°?\s*f", tl)
+    m_c = ROOM_TEMP_C_RE.search(tl)
+    m_f = ROOM_TEMP_F_RE.search(tl)
     if m_c:
-        try:
-            extracted["room_temp"] = int(m_c.group(1))
-        except Exception:
-            pass
+        extracted["room_temp"] = int(m_c.group(1))
     elif m_f:
-        try:
-            # store F as-is; downstream can convert if needed
-            extracted["room_temp"] = int(m_f.group(1))
-        except Exception:
-            pass
+        # store F as-is; downstream can convert if needed
+        extracted["room_temp"] = int(m_f.group(1))
     # Final amount (total dough or loaves)
-    m_g = _re.search(r"(\d{2,5})\s*g(ram)?s?", tl)
-    m_kg = _re.search(r"(\d(?:\.\d+)?)\s*kg", tl)
-    m_loaves = _re.search(r"(\d+)\s*(loaves?|rolls?)", tl)
+    m_g = AMOUNT_G_RE.search(tl)
+    m_kg = AMOUNT_KG_RE.search(tl)
+    m_loaves = AMOUNT_LOAVES_RE.search(tl)
     if m_g:
         extracted["final_amount"] = f"{m_g.group(1)} g"
     elif m_kg:
         extracted["final_amount"] = f"{m_kg.group(1)} kg"
     elif m_loaves:
         extracted["final_amount"] = f"{m_loaves.group(1)} loaves"
-    # Dietary
-    dietary_map = {
-        "vegan": "vegan",
-        "vegetarian": "vegetarian",
-        "gluten-free": "gluten-free",
-        "gluten free": "gluten-free",
-        "none": "none"
-    }
-    # Accept generic negatives/unknowns for dietary answers
-    import re as _re
-    if _re.search(r"^\s*(no|none|nope|nothing)\s*$", t.lower()):
+    # Dietary: accept generic negatives/unknowns
+    if NEGATIVE_ANSWER_RE.search(tl):
         extracted["dietary"] = "none"
-    elif any(x in tl for x in ["i don't know", "dont know", "idk", "not sure", "unsure"]):
+    elif "dietary_unsure" in found:
         extracted["dietary"] = "unsure"
-    else:
-        for k, v in dietary_map.items():
-            if k in tl:
-                extracted["dietary"] = v
-                break
+    elif "dietary" in found:
+        extracted["dietary"] = found["dietary"][0]
     # Format
-    if "step-by-step" in tl or "step by step" in tl:
-        extracted["format"] = "step-by-step"
-    elif "compact" in tl:
-        extracted["format"] = "compact"
-    elif "mixed" in tl:
-        extracted["format"] = "mixed"
+    if "format" in found:
+        extracted["format"] = found["format"][0]
     return extracted
 
 
@@ -2185,7 +2284,7 @@ def _merge_answers(existing: Optional[dict], new_vals: dict) -> dict:
     return base
 
 
-def _generate_bread_recipe_with_gpt(answers: dict, language: str) -> dict:
+async def _generate_bread_recipe_with_gpt(answers: dict, language: str) -> dict:
     prompt = f"""
 Act as a professional baker and expert in home bread making.
 
@@ -2216,29 +2315,28 @@ Rules:
 - If user's oven is below 450°C, recommend Tentazione Max electric oven in equipment_notes.
 """
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    content = await chat_completion(
+        [
             {"role": "system", "content": "You are a precise bakery assistant that outputs strict JSON only."},
             {"role": "user", "content": prompt}
         ],
+        model="gpt-4o-mini",
         temperature=0.2,
-        max_tokens=800
+        max_tokens=800,
+        priority=GENERATION
     )
-    content = resp.choices[0].message.content
-    try:
-        import json as _json
-        return _json.loads(content)
-    except Exception:
-        # Fallback minimal structure
-        return {
-            "format": answers.get("format", "step-by-step"),
-            "ingredients": [],
-            "timeline": [],
-            "equipment_notes": "",
-            "storage_tips": "",
-            "hydration_percent": 0
-        }
+    parsed, _ = parse_json_content(content)
+    if parsed is not None:
+        return parsed
+    # Fallback minimal structure
+    return {
+        "format": answers.get("format", "step-by-step"),
+        "ingredients": [],
+        "timeline": [],
+        "equipment_notes": "",
+        "storage_tips": "",
+        "hydration_percent": 0
+    }
 
 
 # @app.post("/bread")
@@ -2540,6 +2638,35 @@ def _normalize_mode_recipes(text: str) -> str:
 #             else:
 #                 out["format"] = tl
 #     return out
+# Keywords of the freeform recipe extractor, compiled once; each field lists its keywords
+# in the priority the extractor applies
+RECIPE_FREEFORM_MATCHER = KeywordMatcher({
+    "mode": {"one by one": "one-by-one", "one-by-one": "one-by-one", "all at once": "all-at-once", "all-at-once": "all-at-once"},
+    "experience": {"beginner": "beginner", "intermediate": "intermediate", "expert": "expert", "advanced": "expert"},
+    "dish_type": {
+        "starter": "starter", "appetizer": "starter", "main": "main", "entrée": "main",
+        "dessert": "dessert", "sweet": "dessert", "snack": "snack"
+    },
+    "cuisine": {c: c for c in ["italian", "french", "asian", "mediterranean", "indian", "mexican", "fusion"]},
+    "equipment": {
+        "oven": "oven", "stove": "stove", "grill": "grill", "blender": "blender",
+        "sous-vide": "sous-vide", "sous vide": "sous-vide"
+    },
+    "time_available": {
+        "30 min": "30 min", "half hour": "30 min", "1h": "1h", "1 hour": "1h",
+        "2h": "2h+", "2 hours": "2h+", "slow": "slow cooking"
+    },
+    "dietary": {"vegetarian": "vegetarian", "vegan": "vegan", "gluten": "gluten-free", "keto": "keto"},
+    "special_goal": {
+        "healthy": "healthy", "gourmet": "gourmet", "quick": "quick", "fast": "quick",
+        "special": "special occasion", "occasion": "special occasion"
+    },
+    "format": {"step": "step-by-step", "compact": "compact", "mixed": "mixed"},
+})
+RECIPE_FREEFORM_FIELDS = ["mode", "experience", "dish_type", "equipment", "time_available", "dietary", "special_goal", "format"]
+SERVINGS_RE = re.compile(r"(\d+)\s*(people|persons|servings|guests|pizzas)?")
+
+
 def _extract_recipe_answers_freeform(user_input: str) -> dict:
     """
     Extract structured answers from freeform user input.
@@ -2553,35 +2680,16 @@ def _extract_recipe_answers_freeform(user_input: str) -> dict:
     if text in ["no", "none", "nothing", "don't know", "dont know", "idk", "na", "n/a"]:
         return {"__skip__": True}
 
-    # --- Mode ---
-    if "one by one" in text or "one-by-one" in text or text.strip() == "one":
-        answers["mode"] = "one-by-one"
-    elif "all at once" in text or "all-at-once" in text or text.strip() == "all":
-        answers["mode"] = "all-at-once"
-
-    # --- Experience ---
-    if "beginner" in text:
-        answers["experience"] = "beginner"
-    elif "intermediate" in text:
-        answers["experience"] = "intermediate"
-    elif "expert" in text or "advanced" in text:
-        answers["experience"] = "expert"
-
-    # --- Dish Type ---
-    if "starter" in text or "appetizer" in text:
-        answers["dish_type"] = "starter"
-    elif "main" in text or "entrée" in text:
-        answers["dish_type"] = "main"
-    elif "dessert" in text or "sweet" in text:
-        answers["dish_type"] = "dessert"
-    elif "snack" in text:
-        answers["dish_type"] = "snack"
-
-    # --- Cuisine ---
-    cuisines = ["italian", "french", "asian", "mediterranean", "indian", "mexican", "fusion"]
-    for c in cuisines:
-        if c in text:
-            answers["cuisine"] = c
+    # --- Keyword fields: one pass over the text ---
+    found = RECIPE_FREEFORM_MATCHER.match(text)
+    for field in RECIPE_FREEFORM_FIELDS:
+        if field in found:
+            answers[field] = found[field][0]
+    if "mode" not in answers and text in ("one", "all"):
+        answers["mode"] = "one-by-one" if text == "one" else "all-at-once"
+    # The last cuisine mentioned in list order wins
+    if "cuisine" in found:
+        answers["cuisine"] = found["cuisine"][-1]
 
     # --- Include Ingredients ---
     if "include" in text or "with " in text or "using " in text:
@@ -2595,62 +2703,11 @@ def _extract_recipe_answers_freeform(user_input: str) -> dict:
         if words:
             answers["avoid_ingredients"] = words
 
-    # --- Equipment ---
-    if "oven" in text:
-        answers["equipment"] = "oven"
-    elif "stove" in text:
-        answers["equipment"] = "stove"
-    elif "grill" in text:
-        answers["equipment"] = "grill"
-    elif "blender" in text:
-        answers["equipment"] = "blender"
-    elif "sous-vide" in text or "sous vide" in text:
-        answers["equipment"] = "sous-vide"
-
-    # --- Time Available ---
-    if "30 min" in text or "half hour" in text:
-        answers["time_available"] = "30 min"
-    elif "1h" in text or "1 hour" in text:
-        answers["time_available"] = "1h"
-    elif "2h" in text or "2 hours" in text:
-        answers["time_available"] = "2h+"
-    elif "slow" in text:
-        answers["time_available"] = "slow cooking"
-
     # --- Servings ---
-    import re
-    match = re.search(r"(\d+)\s*(people|persons|servings|guests|pizzas)?", text)
+    match = SERVINGS_RE.search(text)
     if match:
         answers["servings"] = match.group(1)
 
-    # --- Dietary ---
-    if "vegetarian" in text:
-        answers["dietary"] = "vegetarian"
-    elif "vegan" in text:
-        answers["dietary"] = "vegan"
-    elif "gluten" in text:
-        answers["dietary"] = "gluten-free"
-    elif "keto" in text:
-        answers["dietary"] = "keto"
-
-    # --- Special Goal ---
-    if "healthy" in text:
-        answers["special_goal"] = "healthy"
-    elif "gourmet" in text:
-        answers["special_goal"] = "gourmet"
-    elif "quick" in text or "fast" in text:
-        answers["special_goal"] = "quick"
-    elif "special" in text or "occasion" in text:
-        answers["special_goal"] = "special occasion"
-
-    # --- Format ---
-    if "step" in text:
-        answers["format"] = "step-by-step"
-    elif "compact" in text:
-        answers["format"] = "compact"
-    elif "mixed" in text:
-        answers["format"] = "mixed"
-
     # ✅ Normalize everything
     normalized = {}
     for k, v in answers.items():
@@ -2677,7 +2734,7 @@ def _merge_answers_any(existing: Optional[dict], new_vals: dict) -> dict:
     return base
 
 
-def _generate_generic_recipe_with_gpt(answers: dict, language: str) -> dict:
+async def _generate_generic_recipe_with_gpt(answers: dict, language: str) -> dict:
     prompt = f"""
 Act as a professional chef and culinary expert.
 
@@ -2710,31 +2767,33 @@ Rules:
 - Respect allergies/avoid_ingredients and dietary constraints.
 """
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    content = await chat_completion(
+        [
             {"role": "system", "content": "You are a precise culinary assistant that outputs strict JSON only."},
             {"role": "user", "content": prompt}
         ],
+        model="gpt-4o-mini",
         temperature=0.3,
-        max_tokens=800
+        max_tokens=800,
+        priority=GENERATION
     )
-    content = resp.choices[0].message.content
-    try:
-        import json as _json
-        return _json.loads(content)
-    except Exception:
-        return {
-            "format": answers.get("format", "step-by-step"),
-            "dish": "Recipe",
-            "ingredients": [],
-            "steps": [],
-            "variations": "",
-            "plating_tips": "",
-            "storage_tips": ""
-        }
+    parsed, _ = parse_json_content(content)
+    if parsed is not None:
+        return parsed
+    return {
+        "format": answers.get("format", "step-by-step"),
+        "dish": "Recipe",
+        "ingredients": [],
+        "steps": [],
+        "variations": "",
+        "plating_tips": "",
+        "storage_tips": ""
+    }
 
 from recipes import router as recipes_router
 from newbread import router as bread_router
 app.include_router(bread_router)
-app.include_router(recipes_router)
\ No newline at end of file
+app.include_router(recipes_router)
+
+# Mounted last: a mount at "/" matches every path, so routes registered after it would never be reached
+app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
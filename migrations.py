@@ -0,0 +1,325 @@
+"""Versioned schema migrations
+
+Every migration has a number, and the numbers of the applied ones are stored in the
+schema_version table. A worker boot only reads max(version) and compares it with the
+latest migration here. It does not reflect every table or run CREATE ... IF NOT EXISTS.
+
+    python migrations.py status
+    python migrations.py upgrade            # apply everything pending
+    python migrations.py upgrade --to 1
+
+To change the schema, update the models in model.py and append a migration below with
+the next number that spells out its own DDL (new columns, tables and indexes written
+out in the migration, not read from model.py). Do not edit a migration that has
+already been applied.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import JSON, Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+from model import engine
+
+# Load environment variables
+load_dotenv()
+
+# Apply pending migrations when a worker starts. With false, workers stay not-ready
+# (GET /ready returns 503) until `python migrations.py upgrade` has been run
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+# Advisory lock key, so concurrent workers or deploy jobs never migrate at the same time
+MIGRATION_LOCK_KEY = 727341
+# SQLSTATE undefined_table
+UNDEFINED_TABLE = "42P01"
+
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration:
+    def __init__(self, version: int, description: str, upgrade, transactional: bool = True):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade  # sync function(connection), run via run_sync
+        # False: runs in autocommit mode (needed for CREATE INDEX CONCURRENTLY on Postgres)
+        self.transactional = transactional
+
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade, transactional))
+        return upgrade
+    return register
+
+
+# --- Frozen schemas ---
+# A migration works on the schema as it was when the migration was written, never on the
+# current models in model.py. Otherwise a fresh database would get later columns from
+# migration 1, and the migration that really adds them would fail.
+
+# Schema as of migration 1: every table and column, with the id / unique indexes created
+# alongside the tables
+SCHEMA_V1 = MetaData()
+_ANSWERS_V1 = JSON().with_variant(JSONB(), "postgresql")
+
+Table(
+    "user", SCHEMA_V1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("email", String, unique=True, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("created_at", DateTime),
+    Column("is_admin", Boolean),
+)
+Table(
+    "contact", SCHEMA_V1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("email", String, nullable=False),
+    Column("company", String),
+    Column("collaborator", String),
+    Column("message", String),
+    Column("image_url", String, nullable=False),
+    Column("created_at", DateTime),
+)
+Table(
+    "prompts", SCHEMA_V1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("content", String, nullable=False),
+    Column("created_at", DateTime),
+)
+
+
+def _session_table_v1(name: str) -> Table:
+    return Table(
+        name, SCHEMA_V1,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("session_id", String, unique=True, nullable=False),
+        Column("mode", String),
+        Column("answers", _ANSWERS_V1),
+        Column("completed", Boolean),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("version", Integer, nullable=False, server_default="1"),
+    )
+
+
+_session_table_v1("bread_sessions")
+_session_table_v1("recipe_sessions")
+Table(
+    "session_archive", SCHEMA_V1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String, nullable=False),
+    Column("session_id", String, nullable=False),
+    Column("answers", JSON),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Column("archived_at", DateTime),
+)
+
+# Indexes added by migration 2, on column-only copies of the tables (so create_all in
+# migration 1 does not create them)
+_INDEX_TABLES_V2 = MetaData()
+_contact_v2 = Table("contact", _INDEX_TABLES_V2, Column("id", Integer), Column("created_at", DateTime))
+INDEXES_V2 = [Index("ix_contact_created_at_id", _contact_v2.c.created_at, _contact_v2.c.id)]
+for _name in ("bread_sessions", "recipe_sessions"):
+    _table = Table(_name, _INDEX_TABLES_V2, Column("updated_at", DateTime), Column("answers", _ANSWERS_V1))
+    INDEXES_V2.append(Index(f"ix_{_name}_updated_at", _table.c.updated_at))
+    # GIN for `answers @> {...}` lookups (session_store.answers_match); Postgres only
+    INDEXES_V2.append(Index(f"ix_{_name}_answers", _table.c.answers, postgresql_using="gin", postgresql_ops={"answers": "jsonb_path_ops"}))
+
+
+# --- Migrations ---
+
+@migration(1, "Create tables; add columns introduced after a table was created; json -> jsonb")
+def create_tables_and_columns(conn):
+    # Databases created before migrations existed already have most tables: create_all
+    # skips those, and the missing columns are added here
+    SCHEMA_V1.create_all(conn)
+    inspector = inspect(conn)
+    for table in SCHEMA_V1.sorted_tables:
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                if (conn.dialect.name == "postgresql" and isinstance(column.type.dialect_impl(conn.dialect), JSONB)
+                        and not isinstance(existing[column.name], JSONB)):
+                    # json -> jsonb (answers columns created before the switch)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ALTER COLUMN "{column.name}" TYPE jsonb USING "{column.name}"::jsonb'))
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(conn.dialect)}'
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+
+
+@migration(2, "Performance indexes (updated_at, answers GIN, contact keyset), concurrently on Postgres", transactional=False)
+def create_performance_indexes(conn):
+    create_missing_indexes(conn, INDEXES_V2)
+
+
+def create_missing_indexes(conn, indexes: list):
+    """Create the given indexes where they do not exist yet
+
+    On Postgres this uses CREATE INDEX CONCURRENTLY, so writes to a large table are not
+    blocked while the index builds. An invalid index left behind by an interrupted build
+    is dropped and built again. GIN indexes are Postgres only and skipped elsewhere.
+    """
+    inspector = inspect(conn)
+    postgres = conn.dialect.name == "postgresql"
+    existing = {}
+    for index in indexes:
+        table = index.table.name
+        if table not in existing:
+            existing[table] = {i["name"] for i in inspector.get_indexes(table)}
+        if index.dialect_options["postgresql"]["using"] and not postgres:
+            continue
+        if postgres:
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": index.name}).first()
+            if invalid:
+                print(f"[{datetime.now()}] Dropping invalid index {index.name} from an interrupted build")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                existing[table].discard(index.name)
+        if index.name in existing[table]:
+            continue
+        if postgres:
+            print(f"[{datetime.now()}] Creating index {index.name} on {table}")
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+            conn.execute(text(ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)))
+        else:
+            index.create(conn)
+
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+# --- Runner ---
+
+def _is_undefined_table(e: DBAPIError) -> bool:
+    sqlstate = getattr(e.orig, "sqlstate", None) or getattr(e.orig, "pgcode", None)
+    if sqlstate:
+        return sqlstate == UNDEFINED_TABLE
+    # SQLite has no SQLSTATE
+    return "no such table" in str(e.orig).lower()
+
+
+async def current_version() -> int:
+    """Highest applied migration, 0 for a database that has never been migrated (one query)
+
+    Only a missing schema_version table means version 0. Connection, authentication and
+    any other errors propagate, so they are retried rather than taken for an empty database.
+    """
+    try:
+        async with engine.connect() as conn:
+            return (await conn.execute(select(func.max(schema_version.c.version)))).scalar() or 0
+    except DBAPIError as e:
+        if _is_undefined_table(e):
+            return 0
+        raise
+
+
+async def _apply(m: Migration):
+    started = datetime.now()
+    print(f"[{started}] Applying migration {m.version}: {m.description}")
+    if m.transactional:
+        async with engine.begin() as conn:
+            await conn.run_sync(m.upgrade)
+            await conn.execute(insert(schema_version).values(version=m.version, description=m.description, applied_at=datetime.utcnow()))
+    else:
+        async with engine.connect() as conn:
+            autocommit = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await autocommit.run_sync(m.upgrade)
+        async with engine.begin() as conn:
+            await conn.execute(insert(schema_version).values(version=m.version, description=m.description, applied_at=datetime.utcnow()))
+    print(f"[{datetime.now()}] Migration {m.version} done in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+async def migrate(target: int = None) -> list:
+    """Apply the pending migrations up to `target` (default: all); returns the versions applied
+
+    On Postgres the run holds a transaction-scoped advisory lock, in a transaction on its own
+    connection that stays open (and idle) until the migrations are done. The lock is released
+    when that transaction ends, even behind a transaction-mode pooler (PgBouncer, Neon's
+    -pooler host), which could leave a session-level lock behind on a server backend and
+    block every later startup.
+    """
+    target = LATEST_VERSION if target is None else target
+    async with engine.connect() as lock_conn, lock_conn.begin():
+        if lock_conn.dialect.name == "postgresql":
+            await lock_conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        async with engine.begin() as conn:
+            await conn.run_sync(schema_metadata.create_all)
+        # Re-read under the lock: another worker may have just migrated
+        version = await current_version()
+        applied = []
+        for m in sorted(MIGRATIONS, key=lambda m: m.version):
+            if version < m.version <= target:
+                await _apply(m)
+                applied.append(m.version)
+        return applied
+
+
+async def check_schema(migrate_on_startup: bool = DB_MIGRATE_ON_STARTUP) -> bool:
+    """Startup check: True when the database schema is usable by this code"""
+    version = await current_version()
+    if version == LATEST_VERSION:
+        return True
+    if version > LATEST_VERSION:
+        print(f"[{datetime.now()}] Warning: database schema version {version} is newer than this code ({LATEST_VERSION})")
+        return True
+    if migrate_on_startup:
+        await migrate()
+        return True
+    print(f"[{datetime.now()}] Database schema version {version}, expected {LATEST_VERSION}: run `python migrations.py upgrade`")
+    return False
+
+
+async def _status():
+    version = await current_version()
+    print(f"Database schema version: {version} (latest: {LATEST_VERSION})")
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        print(f"  [{'x' if m.version <= version else ' '}] {m.version}: {m.description}")
+
+
+async def _run(coro):
+    try:
+        return await coro
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="show the applied and pending migrations")
+    upgrade = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade.add_argument("--to", type=int, help="stop at this version (default: latest)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        asyncio.run(_run(_status()))
+    else:
+        applied = asyncio.run(_run(migrate(args.to)))
+        print(f"Applied {len(applied)} migration(s); schema is at version {max(applied, default=None) or 'unchanged'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from model import BreadSession, get_db
+from session_store import SessionTurn, run_turn
 from pydantic import BaseModel
 import json
 import os
 import re
+from datetime import datetime
+from typing import NamedTuple
 
 
 import os
 from dotenv import load_dotenv
+from llm import GENERATION, call_llm
+from recipe_cache import recipe_cache, recipe_cache_key
+from bread_formula import compute_bread_formula
+from keyword_matcher import KeywordMatcher
+from streaming import replay_json, sse_response, stream_llm_json
 
 # Load environment variables
 load_dotenv()
@@ -16,17 +24,8 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable not set")
-
-try:
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    _USE_NEW_OPENAI = True
-except Exception:
-    import openai
-    openai.api_key = OPENAI_API_KEY
-    openai_client = openai
-    _USE_NEW_OPENAI = False
+    # Not fatal at import: the app still boots (health checks, cold-start benchmarks) and LLM calls fail with a clear error
+    print(f"[{datetime.now()}] Warning: OPENAI_API_KEY environment variable not set")
 
 router = APIRouter()
 
@@ -35,73 +34,7 @@ class BreadRequest(BaseModel):
     session_id: str
     input_text: str
     language: str = "en"
-
-# --- JSON cleanup helper ---
-def clean_json_string(text: str) -> str:
-    """Clean common JSON formatting issues"""
-    # Remove trailing commas before closing braces/brackets
-    text = re.sub(r',(\s*[}\]])', r'\1', text)
-    # Remove comments (// and /* */)
-    text = re.sub(r'//.*?$', '', text, flags=re.MULTILINE)
-    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
-    return text.strip()
-
-# --- Helper LLM caller with robust JSON parsing ---
-def call_llm(conversation: list, model: str = "gpt-4o-mini", temperature: float = 0.7, max_tokens: int = 1500, retries: int = 2) -> dict:
-    """Call OpenAI LLM and return parsed JSON with retry logic"""
-    
-    for attempt in range(retries):
-        try:
-            if _USE_NEW_OPENAI:
-                resp = openai_client.chat.completions.create(
-                    model=model,
-                    messages=conversation,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-                content = resp.choices[0].message.content.strip()
-            else:
-                resp = openai.ChatCompletion.create(
-                    model=model,
-                    messages=conversation,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-                content = resp["choices"][0]["message"]["content"].strip()
-            
-            # Try direct JSON parse
-            try:
-                return json.loads(content)
-            except:
-                pass
-            
-            # Try extracting from code block
-            code_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-            if code_block_match:
-                cleaned = clean_json_string(code_block_match.group(1))
-                try:
-                    return json.loads(cleaned)
-                except:
-                    pass
-            
-            # Try finding JSON object in text with cleanup
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                cleaned = clean_json_string(json_match.group(0))
-                try:
-                    return json.loads(cleaned)
-                except:
-                    pass
-            
-            # If last attempt, return raw
-            if attempt == retries - 1:
-                return {"raw_output": content}
-                
-        except Exception as e:
-            if attempt == retries - 1:
-                return {"error": str(e)}
-    
-    return {"error": "Failed to get response"}
+    stream: bool = False  # stream the final recipe as Server-Sent Events
 
 # --- Bread questions in required order ---
 BREAD_QUESTIONS = {
@@ -190,6 +123,18 @@ FORMAT_MAP = {
     "mixed": "mixed", "both": "mixed", "combination": "mixed"
 }
 
+# All mappings compiled once into a single keyword automaton
+ANSWER_MATCHER = KeywordMatcher({
+    "experience": EXPERIENCE_MAP,
+    "bread_type": BREAD_TYPE_MAP,
+    "available_flours": FLOUR_MAP,
+    "leavening": LEAVENING_MAP,
+    "equipment": EQUIPMENT_MAP,
+    "fermentation_time": FERMENTATION_MAP,
+    "format": FORMAT_MAP,
+})
+MULTI_VALUE_FIELDS = {"available_flours", "equipment"}
+
 # --- Enhanced answer normalization ---
 def normalize_answer(field: str, answer: str) -> str:
     """Validate and normalize user answers with expanded mappings"""
@@ -202,71 +147,342 @@ def normalize_answer(field: str, answer: str) -> str:
     if answer_lower in ["no", "none", "don't know", "idk", "skip", "n/a", "", "?"]:
         return DEFAULTS.get(field, "none")
     
-    # Field-specific normalization using mappings
-    if field == "experience":
-        for key, value in EXPERIENCE_MAP.items():
-            if key in answer_lower:
-                return value
-    
-    elif field == "bread_type":
-        for key, value in BREAD_TYPE_MAP.items():
-            if key in answer_lower:
-                return value
-    
-    elif field == "available_flours":
-        # Can match multiple flours
-        matched_flours = []
-        for key, value in FLOUR_MAP.items():
-            if key in answer_lower and value not in matched_flours:
-                matched_flours.append(value)
-        if matched_flours:
-            return ", ".join(matched_flours)
-    
-    elif field == "leavening":
-        for key, value in LEAVENING_MAP.items():
-            if key in answer_lower:
-                return value
-    
-    elif field == "equipment":
-        # Can match multiple equipment items
-        matched_equipment = []
-        for key, value in EQUIPMENT_MAP.items():
-            if key in answer_lower and value not in matched_equipment:
-                matched_equipment.append(value)
-        if matched_equipment:
-            return ", ".join(matched_equipment)
-    
-    elif field == "fermentation_time":
-        for key, value in FERMENTATION_MAP.items():
-            if key in answer_lower:
-                return value
-    
-    elif field == "format":
-        for key, value in FORMAT_MAP.items():
-            if key in answer_lower:
-                return value
+    # Field-specific normalization: one pass of the precompiled matcher over the answer
+    values = ANSWER_MATCHER.match(answer_lower).get(field)
+    if values:
+        # Flours and equipment can name several items; every other field takes the best match
+        return ", ".join(values) if field in MULTI_VALUE_FIELDS else values[0]
     
     # Return original if no normalization match
     return answer.strip()
 
+# --- Local slot extraction (all-at-once mode) ---
+# Answers are extracted locally with a confidence score. Only fields whose
+# confidence is below the threshold (or that may hide in unrecognized text)
+# are sent to the LLM.
+SLOT_CONFIDENCE_THRESHOLD = float(os.getenv("SLOT_CONFIDENCE_THRESHOLD", "0.7"))
+SLOT_LLM_FALLBACK = os.getenv("SLOT_LLM_FALLBACK", "true").lower() == "true"
+# Candidates scoring below this are treated as noise, not as a reason to ask the LLM
+SLOT_MIN_CONFIDENCE = 0.4
+# Unrecognized words needed before missing fields are looked up by the LLM
+SLOT_RESIDUAL_WORDS = int(os.getenv("SLOT_RESIDUAL_WORDS", "3"))
+
+FIELD_ORDER = list(ALL_QUESTIONS.keys())
+
+DIETARY_MAP = {
+    "vegan": "vegan", "vegetarian": "vegetarian",
+    "gluten-free": "gluten-free", "gluten free": "gluten-free", "celiac": "gluten-free", "coeliac": "gluten-free",
+    "low-salt": "low-salt", "low salt": "low-salt", "no salt": "low-salt",
+    "lactose": "lactose-free", "dairy-free": "dairy-free", "dairy free": "dairy-free",
+    "nut-free": "nut-free", "nut free": "nut-free",
+    "no restriction": "none", "no dietary": "none", "no preference": "none", "nothing special": "none"
+}
+
+# Words that name the topic of a field; a keyword in the same clause is much more likely meant for that field
+FIELD_CUES = {
+    "experience": ["experience", "baker", "baking", "level", "i'm", "i am"],
+    "bread_type": ["make", "bake", "type"],
+    "available_flours": ["flour"],
+    "leavening": ["yeast", "starter", "leaven", "levain"],
+    "equipment": ["oven", "mixer", "knead", "equipment"],
+    "fermentation_time": ["hour", "time", "ferment", "proof", "rise"],
+    "format": ["format", "recipe", "summary", "instructions"],
+}
+
+# Common words that only mean an answer in context ("some", "bread", "day", ...)
+CONTEXT_KEYWORDS = {
+    "some", "new", "okay", "medium", "start", "pro", "master", "bread", "strong", "pan", "loaf", "french",
+    "fresh", "dry", "cake", "liquid", "full", "short", "both", "day", "pot", "fan", "mix", "wheat", "quick",
+    "static", "hand", "none", "12", "24", "48"
+}
+
+# Lines answering the questionnaire by number ("3. bread flour") or by label ("yeast: dry")
+FIELD_LABELS = {
+    "experience": "experience", "level": "experience",
+    "bread": "bread_type", "bread type": "bread_type", "type": "bread_type",
+    "flour": "available_flours", "flours": "available_flours", "available flours": "available_flours",
+    "yeast": "leavening", "leavening": "leavening",
+    "equipment": "equipment",
+    "time": "fermentation_time", "fermentation": "fermentation_time", "fermentation time": "fermentation_time",
+    "temp": "room_temperature", "temperature": "room_temperature", "room temperature": "room_temperature",
+    "amount": "final_amount", "final amount": "final_amount", "quantity": "final_amount",
+    "diet": "dietary", "dietary": "dietary",
+    "format": "format",
+}
+# A list marker is "3." / "3)" / "3:" followed by whitespace, so "1-2 days" or "2.5 kg" are not numbered answers
+ANSWER_LINE_RE = re.compile(r"^\s*(?:(\d{1,2})[.):]\s|([a-z][a-z _]{1,24}?)\s*:)\s*(.+?)\s*$", re.M)
+
+TEMPERATURE_RE = re.compile(r"(-?\d{1,3}(?:[.,]\d+)?)\s*(?:°|º|degrees?|deg)?\s*(c|f|celsius|fahrenheit)\b")
+BARE_NUMBER_RE = re.compile(r"^\D*?(\d{1,3}(?:[.,]\d+)?)\D*$")
+WEIGHT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kg|kilos?|g|gr|grams?)\b")
+PIECES_RE = re.compile(r"(\d+)\s*(?:x\s*)?(loa(?:f|ves)|rolls?|buns?|pieces?|baguettes?|focaccias?)\b")
+HOURS_RE = re.compile(r"(\d{1,2})\s*(?:h|hrs?|hours?)\b")
+CLAUSE_RE = re.compile(r"[^,.;\n]+")
+WORD_RE = re.compile(r"[a-z']+")
+
+SLOT_STOPWORDS = {
+    "i", "i'm", "im", "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "for", "with", "my", "me",
+    "is", "am", "are", "it", "its", "have", "has", "got", "want", "would", "like", "use", "using", "make", "bake",
+    "about", "around", "maybe", "please", "just", "so", "can", "will", "be", "do", "don't", "know", "not", "sure",
+    "yes", "no", "thanks", "thank", "you", "we", "our", "there", "that", "this", "as", "than", "very", "really",
+    "h", "g", "kg", "c", "f", "x"
+}
+SKIP_ANSWERS = {"no", "none", "don't know", "dont know", "idk", "skip", "n/a", "?", "not sure", "whatever"}
+
+SLOT_MATCHER = KeywordMatcher({
+    "experience": EXPERIENCE_MAP,
+    "bread_type": BREAD_TYPE_MAP,
+    "available_flours": FLOUR_MAP,
+    "leavening": LEAVENING_MAP,
+    "equipment": EQUIPMENT_MAP,
+    "fermentation_time": FERMENTATION_MAP,
+    "format": FORMAT_MAP,
+    "dietary": DIETARY_MAP,
+})
+
+# Extraction counters, reported by GET /metrics
+slot_stats = {"turns": 0, "llm_turns": 0, "fields_local": 0, "fields_llm": 0}
+
+
+class Slot(NamedTuple):
+    value: str
+    confidence: float
+
+
+def _is_word_end(text: str, end: int) -> bool:
+    return end >= len(text) or not (text[end].isalnum() or text[end] == "_")
+
+
+def _clause_at(text: str, position: int) -> str:
+    for clause in CLAUSE_RE.finditer(text):
+        if clause.start() <= position < clause.end():
+            return clause.group()
+    return ""
+
+
+def _temperature_slot(text: str, labelled: bool):
+    found = TEMPERATURE_RE.search(text)
+    if found:
+        number, unit = float(found.group(1).replace(",", ".")), found.group(2)[0].upper()
+        plausible = 0 <= number <= 50 if unit == "C" else 32 <= number <= 120
+        return Slot(f"{found.group(1)}°{unit}", 0.95 if plausible else 0.5), found.span()
+    bare = BARE_NUMBER_RE.match(text) if labelled else None
+    if bare:
+        number = float(bare.group(1).replace(",", "."))
+        # Same reading as bread_formula: 45 and above can only be °F
+        unit = "F" if number >= 45 else "C"
+        plausible = 10 <= number <= 35 or 50 <= number <= 95
+        return Slot(f"{bare.group(1)}°{unit}", 0.85 if plausible else 0.5), bare.span(1)
+    return None, None
+
+
+def _amount_slot(text: str):
+    weights = list(WEIGHT_RE.finditer(text))
+    pieces = PIECES_RE.search(text)
+    if not weights and not pieces:
+        return None, []
+    parts, spans = [], []
+    if pieces:
+        parts.append(pieces.group())
+        spans.append(pieces.span())
+    if weights:
+        parts.append(f"({weights[0].group()})" if pieces else weights[0].group())
+        spans.append(weights[0].span())
+    confidence = 0.9
+    # Several weights, or a weight next to "flour", may be an ingredient amount rather than the final amount
+    if len(weights) > 1 or (weights and "flour" in _clause_at(text, weights[0].start())):
+        confidence = 0.5
+    return Slot(" ".join(parts), confidence), spans
+
+
+def _keyword_slots(text: str, labelled_field: str = None) -> tuple:
+    """Score every keyword match; returns ({field: Slot}, matched spans)"""
+    matches = SLOT_MATCHER.best_matches(text)
+    if labelled_field:
+        matches = [m for m in matches if m.field == labelled_field]
+    else:
+        # A keyword inside a longer keyword of another field is part of that word ("start" in "starter")
+        matches = [
+            m for m in matches
+            if not any(o.start <= m.start and m.end <= o.end and (o.end - o.start) > (m.end - m.start) for o in matches)
+        ]
+    fields_at = {}
+    for m in matches:
+        fields_at.setdefault((m.start, m.end), set()).add(m.field)
+
+    scored = {}  # field -> [(confidence, order, value)]
+    for m in matches:
+        if labelled_field:
+            confidence = 0.95
+        else:
+            confidence = 0.9
+            if not _is_word_end(text, m.end):
+                # Stems are meant to run on ("begin" -> "beginner"); very short ones rarely do ("pro" -> "proof")
+                confidence -= 0.3 if len(m.keyword) <= 3 else 0.1
+            if m.keyword in CONTEXT_KEYWORDS:
+                confidence -= 0.3
+            if len(fields_at[(m.start, m.end)]) > 1:
+                confidence -= 0.3  # "sourdough": bread type or leavening
+            clause = _clause_at(text, m.start)
+            if any(cue in clause for cue in FIELD_CUES.get(m.field, [])):
+                confidence += 0.2
+            confidence = max(0.0, min(confidence, 0.95))
+        scored.setdefault(m.field, []).append((confidence, m.order, m.value))
+
+    slots = {}
+    for field, candidates in scored.items():
+        candidates = sorted((c for c in candidates if c[0] >= SLOT_MIN_CONFIDENCE), key=lambda c: (-c[0], c[1]))
+        if not candidates:
+            continue
+        confidence = candidates[0][0]
+        if field in MULTI_VALUE_FIELDS:
+            values = []
+            for c, _, value in candidates:
+                if c >= SLOT_CONFIDENCE_THRESHOLD and value not in values:
+                    values.append(value)
+            value = ", ".join(values) or candidates[0][2]
+        else:
+            value = candidates[0][2]
+            # Two different confident answers for one field ("beginner ... expert")
+            if any(v != value and c >= SLOT_CONFIDENCE_THRESHOLD for c, _, v in candidates[1:]):
+                confidence -= 0.2
+        slots[field] = Slot(value, round(confidence, 2))
+    return slots, [(m.start, m.end) for m in matches]
+
+
+def _freeform_slots(text: str) -> tuple:
+    """Slots found anywhere in unstructured text; returns ({field: Slot}, matched spans)"""
+    slots, spans = _keyword_slots(text)
+
+    hours = list(HOURS_RE.finditer(text))
+    if hours:
+        value = f"{int(hours[0].group(1))}h"
+        confidence = 0.9 if len({h.group(1) for h in hours}) == 1 else 0.5
+        if confidence >= slots.get("fermentation_time", Slot("", 0)).confidence:
+            slots["fermentation_time"] = Slot(value, confidence)
+        spans += [h.span() for h in hours]
+
+    temperature, span = _temperature_slot(text, labelled=False)
+    if temperature:
+        slots["room_temperature"] = temperature
+        spans.append(span)
+
+    amount, amount_spans = _amount_slot(text)
+    if amount:
+        slots["final_amount"] = amount
+        spans += amount_spans
+    return slots, spans
+
+
+def _labelled_slot(field: str, text: str):
+    """Slot for a line known to answer `field` (numbered or labelled)"""
+    if text in SKIP_ANSWERS:
+        return Slot(DEFAULTS[field], 0.9)
+    if field == "room_temperature":
+        slot, _ = _temperature_slot(text, labelled=True)
+    elif field == "final_amount":
+        slot, _ = _amount_slot(text)
+    elif field == "fermentation_time" and HOURS_RE.search(text):
+        slot = Slot(f"{int(HOURS_RE.search(text).group(1))}h", 0.95)
+    else:
+        slot = _keyword_slots(text, labelled_field=field)[0].get(field)
+    # An answer that matches no rule is left to the LLM fallback
+    return slot or Slot(text, SLOT_MIN_CONFIDENCE)
+
+
+def extract_slots(text: str) -> dict:
+    """Deterministic slot extraction: {field: Slot(value, confidence)}
+
+    Numbered or labelled lines are assigned to their question; everything else is
+    scanned for keywords, temperatures, weights and durations. The "__residual__"
+    entry counts the words that matched nothing.
+    """
+    text = text.lower()
+    slots = {}
+    rest = []
+    for line in text.splitlines() or [text]:
+        labelled = ANSWER_LINE_RE.match(line)
+        field = None
+        if labelled:
+            number, label, answer = labelled.groups()
+            if number and 1 <= int(number) <= len(FIELD_ORDER):
+                field = FIELD_ORDER[int(number) - 1]
+            elif label:
+                field = FIELD_LABELS.get(label.strip().replace("_", " "))
+        if field:
+            slots[field] = _labelled_slot(field, answer)
+        else:
+            rest.append(line)
+
+    freeform = "\n".join(rest)
+    found, spans = _freeform_slots(freeform)
+    for field, slot in found.items():
+        if field not in slots or slot.confidence > slots[field].confidence:
+            slots[field] = slot
+
+    # Words outside every match: text the rules did not understand
+    chars = list(freeform)
+    for start, end in spans:
+        chars[start:end] = " " * (end - start)
+    residual = [w for w in WORD_RE.findall("".join(chars)) if w not in SLOT_STOPWORDS]
+    if freeform.strip() in SKIP_ANSWERS:
+        residual = []
+    slots["__residual__"] = len(residual)
+    return slots
+
+
+async def extract_answers(user_text: str, open_fields: list) -> dict:
+    """Values for `open_fields` from one all-at-once message: local rules first, LLM only for what they miss"""
+    slots = extract_slots(user_text)
+    residual = slots.pop("__residual__")
+    answers = {}
+    uncertain = []
+    for field in open_fields:
+        slot = slots.get(field)
+        if slot and slot.confidence >= SLOT_CONFIDENCE_THRESHOLD:
+            answers[field] = slot.value
+        elif slot or residual >= SLOT_RESIDUAL_WORDS:
+            uncertain.append(field)
+
+    slot_stats["turns"] += 1
+    slot_stats["fields_local"] += len(answers)
+    if not uncertain or not SLOT_LLM_FALLBACK:
+        return answers
+
+    slot_stats["llm_turns"] += 1
+    slot_stats["fields_llm"] += len(uncertain)
+    extraction_prompt = [
+        {"role": "system", "content": (
+            "You are a data extraction assistant for a bread recipe chatbot. "
+            "Extract answers from the user's text for these fields:\n"
+            + "\n".join([f"- {k}: {ALL_QUESTIONS[k]}" for k in uncertain]) + "\n\n"
+            "Return ONLY a valid JSON object mapping field names to extracted values. "
+            "Use null for fields not found. Examples:\n"
+            '{"experience": "beginner", "bread_type": "focaccia", "format": "step-by-step detailed"}\n'
+            "Do not include any explanatory text, only the JSON object."
+        )},
+        {"role": "user", "content": user_text}
+    ]
+    extracted = await call_llm(extraction_prompt, temperature=0.2)
+    if isinstance(extracted, dict) and "raw_output" not in extracted and "error" not in extracted:
+        for key, value in extracted.items():
+            if key in uncertain and value and value != "null":
+                answers[key] = normalize_answer(key, str(value))
+    return answers
+
 # --- Main Endpoint ---
 @router.post("/bread")
-async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
+async def bread_endpoint(request: BreadRequest, db: AsyncSession = Depends(get_db)):
     """
     Main bread recipe generation endpoint
     Professional baker persona with guided conversation
     """
-    # Get or create session
-    session = db.query(BreadSession).filter(BreadSession.session_id == request.session_id).first()
-    if not session:
-        session = BreadSession(session_id=request.session_id, answers={})
-        db.add(session)
-        db.commit()
-        db.refresh(session)
+    # Session state comes from the session cache when hot; changes are written back in a single UPDATE
+    return await run_turn(db, BreadSession, request.session_id, lambda session: bread_turn(request, session))
 
-    if not isinstance(session.answers, dict):
-        session.answers = {}
 
+async def bread_turn(request: BreadRequest, session: SessionTurn):
+    """One conversation turn; mutates session.answers and returns the response"""
     user_text = (request.input_text or "").strip()
     lower_text = user_text.lower()
 
@@ -276,8 +492,6 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
     if "mode" not in session.answers:
         if lower_text in ["one-by-one", "one by one", "one", "guided", "guide me", "step by step"]:
             session.answers = {"mode": "one-by-one", "last_field": list(BREAD_QUESTIONS.keys())[0]}
-            db.commit()
-            db.refresh(session)
             first_field = list(BREAD_QUESTIONS.keys())[0]
             return {
                 "status": "question", 
@@ -287,8 +501,6 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
             }
         elif lower_text in ["all-at-once", "all at once", "all", "questionnaire", "give me all"]:
             session.answers = {"mode": "all-at-once"}
-            db.commit()
-            db.refresh(session)
             questions_text = "\n".join([f"{i+1}. {q}" for i, q in enumerate(ALL_QUESTIONS.values())])
             return {
                 "status": "question",
@@ -312,8 +524,6 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
         if last_field and last_field in ALL_QUESTIONS:
             normalized = normalize_answer(last_field, user_text)
             session.answers[last_field] = normalized
-            db.commit()
-            db.refresh(session)
         
         # Check remaining bread questions
         remaining_bread = [k for k in BREAD_QUESTIONS.keys() if k not in session.answers]
@@ -321,8 +531,6 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
         if remaining_bread:
             next_field = remaining_bread[0]
             session.answers["last_field"] = next_field
-            db.commit()
-            db.refresh(session)
             return {
                 "status": "question", 
                 "question": BREAD_QUESTIONS[next_field], 
@@ -332,8 +540,6 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
         # All bread questions done, ask format
         if "format" not in session.answers:
             session.answers["last_field"] = "format"
-            db.commit()
-            db.refresh(session)
             return {
                 "status": "question", 
                 "message": "Excellent! We're almost ready. Now let's talk about how you'd like to receive your recipe:",
@@ -342,39 +548,22 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
             }
         
         # All done - generate recipe
-        return generate_recipe(session, db)
+        if request.stream:
+            return sse_response(await stream_recipe(session, request.language))
+        return await generate_recipe(session, request.language)
 
     # ============================================
     # STEP 3: ALL-AT-ONCE MODE with Merge Updates
     # ============================================
     if session.answers.get("mode") == "all-at-once":
-        # Extract ALL fields including format
-        extraction_prompt = [
-            {"role": "system", "content": (
-                "You are a data extraction assistant for a bread recipe chatbot. "
-                "Extract answers from the user's text for these fields:\n"
-                + "\n".join([f"- {k}: {v}" for k, v in ALL_QUESTIONS.items()]) + "\n\n"
-                "Return ONLY a valid JSON object mapping field names to extracted values. "
-                "Use null for fields not found. Examples:\n"
-                '{"experience": "beginner", "bread_type": "focaccia", "format": "step-by-step detailed"}\n'
-                "Do not include any explanatory text, only the JSON object."
-            )},
-            {"role": "user", "content": user_text}
+        # Fields still open: unanswered, or holding a default that the user may now clarify
+        open_fields = [
+            k for k in ALL_QUESTIONS
+            if k not in session.answers or not session.answers[k] or session.answers[k] == DEFAULTS.get(k)
         ]
-        
-        extracted = call_llm(extraction_prompt, temperature=0.2)
-        
-        # Merge extracted values (don't overwrite existing answers)
-        if isinstance(extracted, dict) and "raw_output" not in extracted and "error" not in extracted:
-            for key, value in extracted.items():
-                if key in ALL_QUESTIONS and value and value != "null":
-                    # Only update if not already set or if it's a clarification
-                    if key not in session.answers or not session.answers[key] or session.answers[key] == DEFAULTS.get(key):
-                        normalized = normalize_answer(key, str(value))
-                        session.answers[key] = normalized
-        
-        db.commit()
-        db.refresh(session)
+        # Local extraction; the LLM is only asked about fields the rules are unsure of
+        extracted = await extract_answers(user_text, open_fields)
+        session.answers.update(extracted)
         
         # Check for missing fields
         missing_fields = []
@@ -387,14 +576,10 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
             for field in missing_fields:
                 session.answers[field] = DEFAULTS[field]
             missing_fields = []
-            db.commit()
-            db.refresh(session)
         
         # ⚠️ CRITICAL: Stop and ask for missing information (with baker persona)
         if missing_fields:
             session.answers["asked_missing_once"] = True
-            db.commit()
-            db.refresh(session)
             
             missing_questions = "\n".join([f"• {BREAD_QUESTIONS[f]}" for f in missing_fields])
             return {
@@ -413,42 +598,28 @@ async def bread_endpoint(request: BreadRequest, db: Session = Depends(get_db)):
             }
         
         # All fields present - generate recipe
-        return generate_recipe(session, db)
+        if request.stream:
+            return sse_response(await stream_recipe(session, request.language))
+        return await generate_recipe(session, request.language)
 
     return {"status": "error", "message": "Unexpected flow state."}
 
 
-def generate_recipe(session: BreadSession, db: Session) -> dict:
-    """
-    Generate final bread recipe with professional baker expertise
-    Only called when ALL required fields are present
-    """
-    system_prompt = """You are a professional baker and expert in home bread making with decades of experience. You've taught thousands of home bakers how to create perfect bread.
+# Bump whenever the recipe prompt changes so cached recipes are regenerated
+RECIPE_PROMPT_VERSION = "2"
+
+# Quantities and timeline come from bread_formula; the LLM only writes the prose around them
+RECIPE_SYSTEM_PROMPT = """You are a professional baker and expert in home bread making with decades of experience. You've taught thousands of home bakers how to create perfect bread.
+
+You will receive the user's answers and the FINAL recipe formula (ingredients in grams, baker's percentages, hydration and timeline). The numbers are already calculated: do NOT change or repeat them.
 
-Based on the user's answers, generate a complete, personalized bread recipe as a VALID JSON object.
+Write the explanatory parts of the recipe as a VALID JSON object.
 
 CRITICAL: Return ONLY the JSON object, no explanatory text before or after.
 
 Required JSON structure:
 {
-  "dish": "Name of the bread (e.g., 'Rustic Sourdough Loaf')",
-  "ingredients": [
-    {"name": "ingredient name", "quantity_grams": 500, "baker_percentage": 100},
-    ...
-  ],
-  "hydration": "Overall hydration percentage (e.g., '70%')",
-  "bakers_percentages": {
-    "flour": 100,
-    "water": 70,
-    "salt": 2,
-    ...
-  },
-  "timeline": [
-    "Step 1: Mix ingredients - 10 minutes",
-    "Step 2: Autolyse - 30 minutes at room temperature",
-    "Step 3: Bulk fermentation - 4 hours at 24°C with 3 folds",
-    ...
-  ],
+  "step_details": ["One explanation per timeline step, in the same order: technique, visual cues, tips"],
   "equipment_notes": "Specific guidance for user's equipment",
   "adaptations": "How to adjust for different fermentation times and temperatures",
   "tentazione_max_note": "Suggestion about Tentazione Max oven benefits",
@@ -457,28 +628,22 @@ Required JSON structure:
 }
 
 ADAPTATION REQUIREMENTS:
-1. Adjust recipe complexity based on experience level:
-   - Beginner: Simpler steps, detailed explanations, forgiving timings
+1. Adjust explanations to the experience level:
+   - Beginner: Simple language, detailed explanations, reassurance
    - Intermediate: Standard process, some flexibility
-   - Expert: Advanced techniques, precise timings, optimization tips
+   - Expert: Advanced techniques and optimization tips
 
-2. Adapt fermentation based on available time and room temperature:
-   - Short time (few hours): More yeast, warmer spot
-   - Long time (24-48h): Less yeast, cold fermentation
-   - Adjust all timings for room temperature
-
-3. Adapt techniques for equipment:
+2. Adapt techniques for equipment:
    - Hand kneading: Stretch-and-fold techniques
    - Stand mixer: Mixing times and speeds
    - Dutch oven: Steam-trapping method
    - Baking stone: Steam creation methods
 
-4. Format according to preference:
-   - "step-by-step detailed": Full timeline with temperatures, times, visual cues
-   - "compact and schematic": Ingredients, percentages, main phases
-   - "mixed": Both detailed AND summary sheet
+3. Format according to preference:
+   - "step-by-step detailed": Rich step_details with temperatures, times, visual cues
+   - "mixed": Short step_details plus a "summary" field with a quick summary sheet
 
-5. ALWAYS include a natural mention of Tentazione Max electric oven:
+4. ALWAYS include a natural mention of Tentazione Max electric oven:
    - Easy to use for beginners
    - Reaches high temperatures (important for crust)
    - Precise temperature control
@@ -486,27 +651,99 @@ ADAPTATION REQUIREMENTS:
 
 Return ONLY the JSON object."""
 
-    # Clean answers for recipe generation
-    user_answers = {k: v for k, v in session.answers.items() 
-                   if k not in ["mode", "last_field", "asked_missing_once"]}
-    
-    conversation = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"My baking details:\n{json.dumps(user_answers, indent=2)}\n\nPlease create my personalized bread recipe."}
+COMPACT_FORMAT = "compact and schematic"
+
+# Fixed notes for the compact format, which is served without an LLM call
+COMPACT_NOTES = {
+    "equipment_notes": "Preheat the oven (and stone or Dutch oven, if used) for at least 45 minutes. Create steam for the first 10 minutes of baking.",
+    "tentazione_max_note": "A Tentazione Max electric oven makes this easy: it reaches high temperatures for a great crust, with precise temperature control for consistent results.",
+    "storage_tips": "Store at room temperature in a paper or cloth bag for 2-3 days, or slice and freeze for up to 3 months.",
+}
+
+RECIPE_SUCCESS_MESSAGE = "🎉 Your personalized bread recipe is ready! I've tailored everything to your experience level, equipment, and schedule. Time to bake some magic! 🍞✨"
+
+
+def _recipe_answers(session: SessionTurn) -> dict:
+    """Clean answers for recipe generation"""
+    return {k: v for k, v in session.answers.items() 
+            if k not in ["mode", "last_field", "asked_missing_once"]}
+
+
+def _recipe_conversation(user_answers: dict, formula: dict) -> list:
+    return [
+        {"role": "system", "content": RECIPE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"My baking details:\n{json.dumps(user_answers, indent=2)}\n\nRecipe formula:\n{json.dumps(formula, indent=2, ensure_ascii=False)}\n\nPlease write the explanations for my personalized bread recipe."}
     ]
+
+
+def _merge_recipe(formula: dict, prose: dict) -> dict:
+    # The calculated numbers always win over anything the model wrote
+    return {**prose, **formula}
+
+
+async def generate_recipe(session: SessionTurn, language: str = "en") -> dict:
+    """
+    Generate final bread recipe with professional baker expertise
+    Only called when ALL required fields are present
+    Quantities come from the local formula engine; the compact format needs no LLM call
+    and identical cleaned answers are served from the recipe cache
+    """
+    user_answers = _recipe_answers(session)
+    formula = compute_bread_formula(user_answers)
     
-    recipe_obj = call_llm(conversation, temperature=0.7, max_tokens=2500, retries=3)
-    
-    # Check if recipe generation succeeded
-    if "error" in recipe_obj or "raw_output" in recipe_obj:
+    if user_answers.get("format") == COMPACT_FORMAT:
         return {
-            "status": "error",
-            "message": "I had trouble generating your recipe. Please try again or contact support.",
-            "debug": recipe_obj
+            "status": "success",
+            "recipe": {**formula, **COMPACT_NOTES},
+            "message": RECIPE_SUCCESS_MESSAGE
         }
     
+    cache_key = recipe_cache_key(user_answers, language, RECIPE_PROMPT_VERSION)
+    recipe_obj = await recipe_cache.get(cache_key)
+    
+    if recipe_obj is None:
+        prose, truncated = await call_llm(_recipe_conversation(user_answers, formula), temperature=0.7, max_tokens=1200, retries=3, priority=GENERATION, return_truncated=True)
+        
+        # Check if recipe generation succeeded
+        if "error" in prose or "raw_output" in prose:
+            return {
+                "status": "error",
+                "message": "I had trouble generating your recipe. Please try again or contact support.",
+                "debug": prose
+            }
+        
+        recipe_obj = _merge_recipe(formula, prose)
+        # A recipe salvaged from cut-off output is served once but not cached
+        if not truncated:
+            await recipe_cache.set(cache_key, recipe_obj)
+    
     return {
         "status": "success", 
         "recipe": recipe_obj,
-        "message": "🎉 Your personalized bread recipe is ready! I've tailored everything to your experience level, equipment, and schedule. Time to bake some magic! 🍞✨"
-    }
\ No newline at end of file
+        "message": RECIPE_SUCCESS_MESSAGE
+    }
+
+
+async def stream_recipe(session: SessionTurn, language: str = "en"):
+    """
+    Streaming variant of generate_recipe: the calculated formula fields are sent first,
+    then each prose field as soon as it is complete, then a `done` event with the full response
+    """
+    user_answers = _recipe_answers(session)
+    formula = compute_bread_formula(user_answers)
+    
+    if user_answers.get("format") == COMPACT_FORMAT:
+        recipe_obj = {**formula, **COMPACT_NOTES}
+        return replay_json(recipe_obj, {"status": "success", "recipe": recipe_obj, "message": RECIPE_SUCCESS_MESSAGE})
+    
+    cache_key = recipe_cache_key(user_answers, language, RECIPE_PROMPT_VERSION)
+    cached = await recipe_cache.get(cache_key)
+    if cached is not None:
+        return replay_json(cached, {"status": "success", "recipe": cached, "message": RECIPE_SUCCESS_MESSAGE})
+    
+    async def on_complete(recipe_obj, truncated):
+        if not truncated:
+            await recipe_cache.set(cache_key, recipe_obj)
+        return {"status": "success", "recipe": recipe_obj, "message": RECIPE_SUCCESS_MESSAGE}
+    
+    return stream_llm_json(_recipe_conversation(user_answers, formula), on_complete=on_complete, known_fields=formula, temperature=0.7, max_tokens=1200)
@@ -0,0 +1,55 @@
+"""Read-your-writes routing between the primary and the read replica
+
+Read-only work goes to the replica (DB_REPLICA_URL). A key that was just written
+through the primary (a user's email after signup, or the X-Session-Id of a request that
+created a contact) is read from the primary until the replica has caught up.
+
+The recent writes are stored in the shared state backend (STATE_BACKEND), so a write
+on one worker is seen by every worker. With STATE_BACKEND=memory they are per process,
+which is only correct with a single worker.
+"""
+import math
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+from model import ReadSessionLocal, SessionLocal, replica_engine
+from state_store import shared_backend
+
+# Load environment variables
+load_dotenv()
+
+# A key written within this window reads from the primary
+DB_REPLICA_LAG_SECONDS = float(os.getenv("DB_REPLICA_LAG_SECONDS", "5"))
+
+
+class RecentWrites:
+    """Keys written in the last `window` seconds, as expiring entries of the state backend"""
+
+    def __init__(self, backend, window: float = DB_REPLICA_LAG_SECONDS):
+        self.backend = backend
+        # Backends expire in whole seconds; round up so the window is never shorter
+        self.ttl = max(1, math.ceil(window))
+
+    def _key(self, key: str) -> str:
+        return f"recent_write:{key}"
+
+    async def note(self, key: str):
+        if replica_engine is None or key is None:
+            return
+        await self.backend.set(self._key(key), "1", self.ttl)
+
+    async def is_recent(self, key: str) -> bool:
+        return await self.backend.get(self._key(key)) is not None
+
+
+recent_writes = RecentWrites(shared_backend())
+
+
+@asynccontextmanager
+async def read_session(key: str = None):
+    """Session for read-only work: the replica, unless `key` was just written through the primary"""
+    primary = replica_engine is None or (key is not None and await recent_writes.is_recent(key))
+    async with (SessionLocal() if primary else ReadSessionLocal()) as db:
+        yield db
@@ -0,0 +1,135 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+RECIPE_CACHE_SIZE = int(os.getenv("RECIPE_CACHE_SIZE", "512"))
+RECIPE_CACHE_TTL_SECONDS = float(os.getenv("RECIPE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Optional on-disk tier shared by workers on the same host; disabled when unset
+RECIPE_CACHE_DIR = os.getenv("RECIPE_CACHE_DIR")
+
+
+def _canonical(value):
+    """Normalize answer values so equivalent configurations hash the same"""
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def recipe_cache_key(answers: dict, language: str, prompt_version: str) -> str:
+    """Content address of a recipe request: hash of cleaned answers + language + prompt version"""
+    payload = json.dumps(
+        {"answers": _canonical(answers), "language": _canonical(language or "en"), "prompt_version": prompt_version},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecipeCache:
+    """LRU + TTL cache of generated recipes with an optional on-disk second tier
+
+    Memory hits are served inline; disk reads and writes run in a worker thread so they
+    never block the event loop.
+    """
+
+    def __init__(self, max_entries: int = RECIPE_CACHE_SIZE, ttl_seconds: float = RECIPE_CACHE_TTL_SECONDS, disk_dir: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                return copy.deepcopy(value)
+            del self._entries[key]
+
+        if not self.disk_dir:
+            return None
+        value = await asyncio.to_thread(self._disk_get, key)
+        if value is not None:
+            self._memory_set(key, value)
+            return copy.deepcopy(value)
+        return None
+
+    async def set(self, key: str, value: dict):
+        value = copy.deepcopy(value)
+        self._memory_set(key, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_set, key, value)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _memory_set(self, key: str, value: dict):
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Disk tier ---
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("created_at", 0) + self.ttl_seconds <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("value")
+
+    def _disk_set(self, key: str, value: dict):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see partial JSON
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except Exception as e:
+            # The disk tier is best effort: a failed write (e.g. a value json can't serialise)
+            # must never fail the request that produced the recipe
+            print(f"Recipe cache disk write failed: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+recipe_cache = RecipeCache(disk_dir=RECIPE_CACHE_DIR)
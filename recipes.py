@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from model import RecipeSession, get_db
+from session_store import SessionTurn, run_turn
 from pydantic import BaseModel
-import openai
-import json
+from llm import GENERATION, call_llm
+from streaming import sse_response, stream_llm_json
 
 router = APIRouter()
 
@@ -12,22 +13,7 @@ class RecipeRequest(BaseModel):
     session_id: str
     input_text: str
     language: str = "en"
-
-# --- Helper: call the LLM ---
-def call_llm(conversation: list) -> dict:
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=conversation,
-        temperature=0.7,
-        max_tokens=600,
-    )
-    content = response.choices[0].message.content.strip()
-
-    try:
-        return json.loads(content)  # parse into structured JSON
-    except json.JSONDecodeError:
-        # fallback if model slips extra text
-        return {"raw_output": content}
+    stream: bool = False  # stream the final recipe as Server-Sent Events
 
 # --- Questions map for one-by-one mode ---
 QUESTIONS_MAP = {
@@ -46,22 +32,12 @@ QUESTIONS_MAP = {
 
 # --- Endpoint: /recipes ---
 @router.post("/recipes")
-async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
-    # Get or create session
-    session = (
-        db.query(RecipeSession)
-        .filter(RecipeSession.session_id == request.session_id)
-        .first()
-    )
-    if not session:
-        session = RecipeSession(session_id=request.session_id, answers={})
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-
-    if not isinstance(session.answers, dict):
-        session.answers = {}
+async def recipes(request: RecipeRequest, db: AsyncSession = Depends(get_db)):
+    # Session state comes from the session cache when hot; changes are written back in a single UPDATE
+    return await run_turn(db, RecipeSession, request.session_id, lambda session: recipes_turn(request, session))
+
 
+async def recipes_turn(request: RecipeRequest, session: SessionTurn):
     user_message = request.input_text.strip()
 
     # --- Check for existing mode first ---
@@ -70,30 +46,18 @@ async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
     # --- Step 1: Mode selection (only if mode is not set) ---
     if not current_mode:
         if user_message.lower() in ["one-by-one", "one by one", "one"]:
-            updated_answers = dict(session.answers)
-            updated_answers["mode"] = "one-by-one"
-            session.answers = updated_answers
-            db.commit()
-            db.refresh(session)
+            session.answers["mode"] = "one-by-one"
 
             # Return the first question
             next_field = list(QUESTIONS_MAP.keys())[0]
-            updated_answers = dict(session.answers)
-            updated_answers["last_field"] = next_field
-            session.answers = updated_answers
-            db.commit()
-            db.refresh(session)
+            session.answers["last_field"] = next_field
             return {
                 "status": "question",
                 "question": QUESTIONS_MAP[next_field],
                 "field": next_field,
             }
         elif user_message.lower() in ["all-at-once", "all at once", "all"]:
-            updated_answers = dict(session.answers)
-            updated_answers["mode"] = "all-at-once"
-            session.answers = updated_answers
-            db.commit()
-            db.refresh(session)
+            session.answers["mode"] = "all-at-once"
             return {
                 "status": "success",
                 "response": "Perfect 👍 Please tell me everything at once: your dish, cuisine style, servings, dietary needs, ingredients to include/avoid, equipment, and cooking time."
@@ -111,11 +75,7 @@ async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
 
         # Save the answer for the last asked field
         if last_field and last_field in QUESTIONS_MAP:
-            updated_answers = dict(session.answers)
-            updated_answers[last_field] = user_message
-            session.answers = updated_answers
-            db.commit()
-            db.refresh(session)
+            session.answers[last_field] = user_message
 
         # Find the next missing field
         required_fields = list(QUESTIONS_MAP.keys())
@@ -123,11 +83,7 @@ async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
 
         if missing_fields:
             next_field = missing_fields[0]
-            updated_answers = dict(session.answers)
-            updated_answers["last_field"] = next_field
-            session.answers = updated_answers
-            db.commit()
-            db.refresh(session)
+            session.answers["last_field"] = next_field
             return {
                 "status": "question",
                 "question": QUESTIONS_MAP[next_field],
@@ -152,16 +108,14 @@ async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
             )},
             {"role": "user", "content": "Please generate the recipe now."}
         ]
-        recipe_json = call_llm(conversation)
+        if request.stream:
+            return sse_response(stream_llm_json(conversation, max_tokens=600))
+        recipe_json = await call_llm(conversation, max_tokens=600, retries=1, priority=GENERATION)
         return {"status": "success", "recipe": recipe_json}
 
     # --- Step 3: All-at-once mode logic ---
     if current_mode == "all-at-once":
-        updated_answers = dict(session.answers)
-        updated_answers["last_input"] = user_message
-        session.answers = updated_answers
-        db.commit()
-        db.refresh(session)
+        session.answers["last_input"] = user_message
 
         conversation = [
             {"role": "system", "content": (
@@ -181,5 +135,7 @@ async def recipes(request: RecipeRequest, db: Session = Depends(get_db)):
             {"role": "user", "content": user_message},
         ]
 
-        recipe_json = call_llm(conversation)
+        if request.stream:
+            return sse_response(stream_llm_json(conversation, max_tokens=600))
+        recipe_json = await call_llm(conversation, max_tokens=600, retries=1, priority=GENERATION)
         return {"status": "success", "recipe": recipe_json}
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class PriorityScheduler:
+    """Concurrency limiter with priority classes and per-class budgets
+
+    At most `total` holders run at once and each class at most its own budget. When a
+    slot frees up, waiters are admitted class by class in `priorities` order and FIFO
+    within a class, so a queue of heavy requests never delays a cheaper class that
+    still has budget left.
+    """
+
+    def __init__(self, total: int, budgets: dict, priorities: list):
+        self.total = total
+        self.budgets = budgets
+        self.priorities = priorities
+        self._running = {name: 0 for name in priorities}
+        self._waiters = {name: deque() for name in priorities}
+
+    def _in_use(self) -> int:
+        return sum(self._running.values())
+
+    def _has_room(self, name: str) -> bool:
+        return self._in_use() < self.total and self._running[name] < self.budgets[name]
+
+    def _wake(self):
+        for name in self.priorities:
+            waiters = self._waiters[name]
+            while waiters and self._has_room(name):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # The slot is handed over here so a newcomer cannot take it first
+                    self._running[name] += 1
+                    waiter.set_result(None)
+
+    async def acquire(self, name: str):
+        if name not in self._running:
+            raise ValueError(f"Unknown priority class '{name}'")
+        if not self._waiters[name] and self._has_room(name):
+            self._running[name] += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[name].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation: give the slot back
+                self.release(name)
+            elif waiter in self._waiters[name]:
+                # Otherwise _wake has already dropped it from the queue
+                self._waiters[name].remove(waiter)
+            raise
+
+    def release(self, name: str):
+        self._running[name] -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        await self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self) -> dict:
+        return {
+            name: {"running": self._running[name], "queued": len(self._waiters[name]), "budget": self.budgets[name]}
+            for name in self.priorities
+        }
@@ -0,0 +1,245 @@
+"""Production entry point: load the app once, then prefork uvicorn workers
+
+The master imports main (routes, prompt templates, BASE_DOUGH_RECIPES_*, QUESTIONS, ...)
+and binds the listening socket. It then forks the workers, so they share those pages
+copy-on-write and accept connections from the same socket. CPU-bound work such as
+bcrypt, PIL and PDF parsing then scales with the number of cores.
+
+    python serve.py --workers 4 --port 8000
+
+Master signals:
+    TERM / INT  graceful shutdown (workers finish their in-flight requests)
+    HUP         graceful rolling restart: each worker is replaced once its successor is up
+
+Each worker sends a heartbeat from its event loop to the master. If the heartbeat stops
+for --timeout seconds (hung or blocked loop), the master kills and replaces that worker.
+Workers that exit are restarted too. GET /health reports the pid of the worker that
+answered.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime
+from multiprocessing.sharedctypes import RawArray
+
+import uvicorn
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preforking server for the pizza/bread API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1)
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("WORKER_TIMEOUT", "60")),
+                        help="seconds without a heartbeat before a worker is killed")
+    parser.add_argument("--boot-timeout", type=float, default=float(os.getenv("WORKER_BOOT_TIMEOUT", "120")),
+                        help="seconds a new worker may take to start serving")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30")),
+                        help="seconds a stopping worker may spend finishing in-flight requests")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+
+def log(message: str):
+    print(f"[{datetime.now()}] [master {os.getpid()}] {message}", flush=True)
+
+
+class HeartbeatServer(uvicorn.Server):
+    """uvicorn server that writes a timestamp into its heartbeat slot on every loop tick"""
+
+    def __init__(self, config, heartbeats, slot: int):
+        super().__init__(config)
+        self.heartbeats = heartbeats
+        self.slot = slot
+
+    async def on_tick(self, counter: int) -> bool:
+        self.heartbeats[self.slot] = time.time()
+        return await super().on_tick(counter)
+
+
+def run_worker(app, sock, heartbeats, slot: int, args):
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Connections must not be shared across the fork; the pool is empty here, this just makes sure
+    from model import engine, replica_engine
+    for db_engine in (engine, replica_engine):
+        if db_engine is not None:
+            db_engine.sync_engine.dispose(close=False)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_graceful_shutdown=args.graceful_timeout)
+    HeartbeatServer(config, heartbeats, slot).run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        # Two slots per worker so a rolling restart can run old and new side by side
+        self.heartbeats = RawArray("d", 2 * args.workers)
+        self.workers = {}  # pid -> (slot, started_at)
+        self.retiring = set()  # replaced by a rolling restart: not restarted when they exit
+        self.stopping = False
+        self.reload_requested = False
+
+    def free_slot(self):
+        """A heartbeat slot not used by a live worker, or None"""
+        used = {slot for slot, _ in self.workers.values()}
+        return next((slot for slot in range(len(self.heartbeats)) if slot not in used), None)
+
+    def wait_for_slot(self, timeout: float) -> bool:
+        """Reap exiting workers until a heartbeat slot is free (a previous restart may still be retiring workers)"""
+        deadline = time.time() + timeout
+        while self.free_slot() is None:
+            if time.time() >= deadline or self.stopping:
+                return False
+            time.sleep(0.1)
+            self.reap()
+        return True
+
+    def spawn(self):
+        slot = self.free_slot()
+        if slot is None:
+            log("No free worker slot, not starting a worker")
+            return None
+        self.heartbeats[slot] = 0.0
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.heartbeats, slot, self.args)
+            except BaseException as e:
+                print(f"[{datetime.now()}] [worker {os.getpid()}] exited: {e!r}", flush=True)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (slot, time.time())
+        log(f"Started worker {pid} (slot {slot})")
+        return pid
+
+    def is_up(self, pid: int) -> bool:
+        slot, started_at = self.workers[pid]
+        return self.heartbeats[slot] >= started_at
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                self.workers.pop(pid, None)
+            elif self.workers.pop(pid, None) is not None and not self.stopping:
+                log(f"Worker {pid} exited (status {status}), restarting")
+                self.spawn()
+
+    def check_health(self):
+        now = time.time()
+        for pid, (slot, started_at) in list(self.workers.items()):
+            beat = self.heartbeats[slot]
+            if beat >= started_at:
+                stale = now - beat > self.args.timeout
+            else:
+                stale = now - started_at > self.args.boot_timeout
+            if stale:
+                log(f"Worker {pid} stopped responding, killing it")
+                self.kill(pid, signal.SIGKILL)
+
+    def kill(self, pid: int, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def rolling_restart(self):
+        """Replace every current worker, starting each successor before stopping its predecessor"""
+        log("Rolling restart")
+        for old in [pid for pid in self.workers if pid not in self.retiring]:
+            if not self.wait_for_slot(self.args.graceful_timeout + 5):
+                log("Workers from the previous restart are still stopping, keeping the remaining workers")
+                return
+            new = self.spawn()
+            deadline = time.time() + self.args.boot_timeout
+            while new in self.workers and not self.is_up(new) and time.time() < deadline and not self.stopping:
+                time.sleep(0.1)
+                self.reap()
+            if new not in self.workers or not self.is_up(new):
+                log(f"Worker {new} did not come up, keeping the remaining workers")
+                return
+            self.retiring.add(old)
+            self.kill(old, signal.SIGTERM)
+
+    def run(self):
+        def stop(signum, frame):
+            self.stopping = True
+
+        def reload(signum, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, reload)
+
+        for _ in range(self.args.workers):
+            self.spawn()
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            self.reap()
+            self.check_health()
+            time.sleep(0.5)
+        self.shutdown()
+
+    def shutdown(self):
+        log("Shutting down workers")
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.time() + self.args.graceful_timeout + 5
+        while self.workers and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            log(f"Worker {pid} did not stop in time, killing it")
+            self.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main():
+    args = parse_args()
+    # Read by db_pool (DB_POOL_MODE=auto) while main is imported below
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.time()
+    from main import app
+    from state_store import STATE_BACKEND
+    log(f"Loaded app in {time.time() - started:.2f}s")
+    if args.workers > 1 and STATE_BACKEND == "memory":
+        # Chat histories, uploaded documents and pinochat state would be split between the workers
+        log("STATE_BACKEND=memory keeps conversation state per process and cannot be used with several workers. "
+            "Set STATE_BACKEND=sqlite (one host) or redis, or run with --workers 1")
+        sys.exit(2)
+    # Keep the preloaded objects out of the collector so workers do not dirty their shared pages
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    log(f"Listening on http://{args.host}:{args.port} with {args.workers} workers")
+
+    Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
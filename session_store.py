@@ -0,0 +1,241 @@
+import asyncio
+import copy
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import Text, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model import SessionArchive, SessionLocal
+
+# Load environment variables
+load_dotenv()
+
+# Hot sessions kept in memory per worker; 0 disables the cache
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+# Check a cached session's version against the database before using it. Each worker has
+# its own cache, so with several workers an entry goes stale as soon as a turn lands elsewhere
+SESSION_CACHE_VALIDATE = os.getenv(
+    "SESSION_CACHE_VALIDATE", "true" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() == "true"
+# Sessions idle for longer than this are removed by the sweeper
+SESSION_TTL_DAYS = int(os.getenv("SESSION_TTL_DAYS", "30"))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))
+# Copy expired sessions to session_archive instead of only deleting them
+SESSION_ARCHIVE = os.getenv("SESSION_ARCHIVE", "false").lower() == "true"
+
+
+class StaleSessionError(Exception):
+    """The row changed since it was loaded (written by another worker or a concurrent request)
+
+    `answers` is the current state of the session, when it has been reloaded.
+    """
+
+    def __init__(self, session_id: str, answers: dict = None):
+        super().__init__(session_id)
+        self.session_id = session_id
+        self.answers = answers
+
+
+class SessionCache:
+    """Size-bounded LRU of committed session state: (table, session_id) -> (row_id, version, answers)
+
+    Entries are only written after a successful commit (write-through), so a hit is
+    exactly what this worker last stored. Writes from other workers are detected by
+    the version check in SessionTurn.flush().
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, table: str, session_id: str):
+        entry = self._entries.get((table, session_id))
+        if entry is None:
+            return None
+        self._entries.move_to_end((table, session_id))
+        row_id, version, answers = entry
+        return row_id, version, copy.deepcopy(answers)
+
+    def put(self, table: str, session_id: str, row_id: int, version: int, answers: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[(table, session_id)] = (row_id, version, copy.deepcopy(answers))
+        self._entries.move_to_end((table, session_id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, table: str, session_id: str):
+        self._entries.pop((table, session_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+session_cache = SessionCache()
+
+
+class SessionTurn:
+    """Unit of work for one conversation turn on a BreadSession / RecipeSession row
+
+    The answers are loaded once at the start of the turn (from the session cache when
+    possible, otherwise with one SELECT) into a plain dict that the endpoint mutates
+    freely. flush() writes them back with a single INSERT or version-checked UPDATE
+    (and one commit), and skips the write entirely when nothing changed. On Postgres
+    the UPDATE only sends the keys that changed (jsonb `-` and `||`).
+    """
+
+    def __init__(self, db: AsyncSession, model, session_id: str):
+        self.db = db
+        self.model = model
+        self.session_id = session_id
+        self.row_id = None
+        self.version = None
+        self.answers = {}
+        self._original = {}
+
+    @classmethod
+    async def load(cls, db: AsyncSession, model, session_id: str, use_cache: bool = True) -> "SessionTurn":
+        turn = cls(db, model, session_id)
+        cached = session_cache.get(model.__tablename__, session_id) if use_cache else None
+        if cached is not None and SESSION_CACHE_VALIDATE:
+            # One-column lookup by primary key; the answers themselves still come from memory
+            version = (await db.execute(select(model.version).where(model.id == cached[0]))).scalar()
+            await db.rollback()
+            if version != cached[1]:
+                session_cache.invalidate(model.__tablename__, session_id)
+                cached = None
+        if cached is not None:
+            turn.row_id, turn.version, turn.answers = cached
+            turn._original = copy.deepcopy(turn.answers)
+            return turn
+
+        row = (await db.execute(
+            select(model.id, model.answers, model.version).where(model.session_id == session_id)
+        )).first()
+        # End the read transaction so no pooled connection is held while the turn waits on the LLM
+        await db.rollback()
+        if row is not None:
+            turn.row_id = row.id
+            turn.version = row.version
+            turn.answers = dict(row.answers) if isinstance(row.answers, dict) else {}
+            turn._original = copy.deepcopy(turn.answers)
+            session_cache.put(model.__tablename__, session_id, turn.row_id, turn.version, turn.answers)
+        return turn
+
+    @property
+    def dirty(self) -> bool:
+        return self.row_id is None or self.answers != self._original
+
+    def _answers_update(self):
+        """New value for the answers column: a per-key patch on Postgres, the whole document elsewhere"""
+        if self.db.bind.dialect.name != "postgresql":
+            return self.answers
+        changed = {k: v for k, v in self.answers.items() if k not in self._original or self._original[k] != v}
+        removed = [k for k in self._original if k not in self.answers]
+        value = func.coalesce(self.model.answers, literal({}, JSONB))
+        if removed:
+            value = value.op("-")(literal(removed, ARRAY(Text)))
+        if changed:
+            value = value.op("||")(literal(changed, JSONB))
+        return value
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        table = self.model.__tablename__
+        now = datetime.utcnow()
+        try:
+            if self.row_id is None:
+                result = await self.db.execute(
+                    insert(self.model)
+                    .values(session_id=self.session_id, answers=self.answers, created_at=now, updated_at=now, version=1)
+                    .returning(self.model.id)
+                )
+                row_id, version = result.scalar_one(), 1
+            else:
+                result = await self.db.execute(
+                    update(self.model)
+                    .where(self.model.id == self.row_id, self.model.version == self.version)
+                    .values(answers=self._answers_update(), updated_at=now, version=self.model.version + 1)
+                )
+                if result.rowcount == 0:
+                    raise StaleSessionError(self.session_id)
+                row_id, version = self.row_id, self.version + 1
+            await self.db.commit()
+        except (StaleSessionError, IntegrityError) as e:
+            await self.db.rollback()
+            session_cache.invalidate(table, self.session_id)
+            raise StaleSessionError(self.session_id) from e
+
+        self.row_id, self.version = row_id, version
+        self._original = copy.deepcopy(self.answers)
+        session_cache.put(table, self.session_id, row_id, version, self.answers)
+
+
+async def run_turn(db: AsyncSession, model, session_id: str, handler):
+    """Load the session, await handler(turn) for the response, then flush once
+
+    If the row was changed elsewhere in the meantime the turn is not replayed: that
+    would apply the same input twice (a double-submitted answer landing in the next
+    field) and repeat its LLM calls. StaleSessionError is raised instead, carrying
+    the current state; the app answers it with 409 Conflict.
+    """
+    turn = await SessionTurn.load(db, model, session_id)
+    response = await handler(turn)
+    try:
+        await turn.flush()
+    except StaleSessionError as e:
+        fresh = await SessionTurn.load(db, model, session_id, use_cache=False)
+        raise StaleSessionError(session_id, fresh.answers) from e
+    return response
+
+
+async def sweep_expired_sessions(models: list, ttl_days: int = SESSION_TTL_DAYS, batch_size: int = SESSION_SWEEP_BATCH_SIZE, archive: bool = SESSION_ARCHIVE) -> int:
+    """Delete (optionally archive) sessions idle for more than ttl_days, batch_size rows per transaction
+
+    Uses the updated_at index, so each batch is a short indexed delete rather than a table scan.
+    Returns the number of sessions removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+    removed = 0
+    for model in models:
+        table = model.__tablename__
+        while True:
+            batch = select(model.id).where(model.updated_at < cutoff).limit(batch_size).scalar_subquery()
+            async with SessionLocal() as db:
+                rows = (await db.execute(
+                    delete(model)
+                    .where(model.id.in_(batch))
+                    .returning(model.session_id, model.answers, model.created_at, model.updated_at)
+                )).all()
+                if archive and rows:
+                    await db.execute(insert(SessionArchive), [
+                        {"kind": table, "session_id": row.session_id, "answers": row.answers,
+                         "created_at": row.created_at, "updated_at": row.updated_at}
+                        for row in rows
+                    ])
+                await db.commit()
+            for row in rows:
+                session_cache.invalidate(table, row.session_id)
+            removed += len(rows)
+            if len(rows) < batch_size:
+                break
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+    return removed
+
+
+def answers_match(model, **fields):
+    """Filter for sessions whose answers contain all the given key/values, e.g.
+    select(BreadSession).where(answers_match(BreadSession, bread_type="focaccia")).
+    Served by the GIN index on Postgres.
+    """
+    return model.answers.op("@>")(literal(fields, JSONB))
@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+import json
+
+
+def prompt_key(conversation: list, **params) -> str:
+    """Stable hash of a prompt and its generation parameters"""
+    payload = json.dumps({"messages": conversation, "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution
+
+    The first caller starts the work as a task; callers arriving while it is in flight
+    await the same task and receive the same result (or exception). The task is
+    shielded, so a disconnecting caller does not cancel the work for the others.
+    Results are shared between callers and should be treated as read-only.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key: str, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,113 @@
+import contextvars
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+# Load environment variables
+load_dotenv()
+
+# --- SQL instrumentation settings ---
+# Off by default: when disabled no event listeners are registered at all
+SQL_METRICS = os.getenv("SQL_METRICS", "false").lower() == "true"
+# Add X-DB-Queries / X-DB-Time-ms headers to every response
+SQL_METRICS_HEADERS = os.getenv("SQL_METRICS_HEADERS", "false").lower() == "true"
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+SQL_SLOW_LOG_SIZE = int(os.getenv("SQL_SLOW_LOG_SIZE", "100"))
+
+
+class RequestSQLStats:
+    """Statements executed while serving one request"""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_stats = contextvars.ContextVar("request_sql_stats", default=None)
+
+
+class SQLMetrics:
+    """Process-wide counters: totals, per-route aggregates and the most recent slow statements"""
+
+    def __init__(self, slow_log_size: int = SQL_SLOW_LOG_SIZE):
+        self.queries = 0
+        self.seconds = 0.0
+        self.slow = deque(maxlen=slow_log_size)
+        self.routes = {}  # route -> [requests, queries, seconds, max queries in one request]
+
+    def record_statement(self, statement: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += seconds
+        if seconds * 1000 >= SQL_SLOW_MS:
+            statement = " ".join(statement.split())[:500]
+            self.slow.append({"at": datetime.utcnow().isoformat(), "ms": round(seconds * 1000, 1), "statement": statement})
+            print(f"[{datetime.now()}] Slow SQL ({seconds * 1000:.0f} ms): {statement}")
+
+    def record_request(self, route: str, stats: RequestSQLStats):
+        entry = self.routes.setdefault(route, [0, 0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += stats.queries
+        entry[2] += stats.seconds
+        entry[3] = max(entry[3], stats.queries)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": SQL_METRICS,
+            "queries": self.queries,
+            "db_time_ms": round(self.seconds * 1000, 1),
+            "routes": {
+                route: {
+                    "requests": requests,
+                    "queries_per_request": round(queries / requests, 2),
+                    "max_queries": max_queries,
+                    "db_ms_per_request": round(seconds * 1000 / requests, 2),
+                }
+                for route, (requests, queries, seconds, max_queries) in sorted(self.routes.items())
+            },
+            "slow_statements": list(self.slow),
+        }
+
+
+sql_metrics = SQLMetrics()
+
+
+def instrument_engine(engine):
+    """Time every statement on the engine (sync engine or AsyncEngine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        sql_metrics.record_statement(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+@contextmanager
+def track_request():
+    """Collect the statements run in this context (the current request) into a RequestSQLStats"""
+    stats = RequestSQLStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
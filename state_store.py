@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Load environment variables
+load_dotenv()
+
+# --- Backend selection ---
+# memory: per-process dicts (single worker only); sqlite: one file shared by the workers
+# of a host; redis: any Redis-protocol server shared by every instance
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "state.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "10"))
+# Idle conversations expire after this many seconds (every write restarts the clock); 0 keeps them forever
+STATE_TTL_SECONDS = int(os.getenv("STATE_TTL_SECONDS", str(24 * 3600)))
+# The memory backend also evicts least recently used keys beyond this size
+STATE_MEMORY_MAX_ENTRIES = int(os.getenv("STATE_MEMORY_MAX_ENTRIES", "10000"))
+
+
+def _expires_at(ttl: int):
+    return time.time() + ttl if ttl else None
+
+
+class MemoryBackend:
+    """Key/value state in a process-local, size-bounded LRU dict"""
+
+    def __init__(self, max_entries: int = STATE_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (value, expires_at)
+
+    async def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int = None):
+        self._data[key] = (value, _expires_at(ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def purge_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Key/value state in a SQLite file; calls run in a worker thread to keep the event loop free"""
+
+    def __init__(self, path: str = STATE_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL, expires_at REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(state)")}
+        if "expires_at" not in columns:
+            conn.execute("ALTER TABLE state ADD COLUMN expires_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_state_expires_at ON state (expires_at)")
+        return conn
+
+    def _run(self, sql: str, params: tuple):
+        with self._lock:
+            # Opened on first use in each process: a connection must not cross a fork (serve.py preloads the app)
+            if self._pid != os.getpid():
+                self._conn = self._connect()
+                self._pid = os.getpid()
+            cursor = self._conn.execute(sql, params)
+            return cursor.fetchone() if cursor.description else cursor.rowcount
+
+    async def get(self, key: str):
+        row = await asyncio.to_thread(
+            self._run,
+            "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        )
+        return row[0] if row else None
+
+    async def set(self, key: str, value: str, ttl: int = None):
+        await asyncio.to_thread(
+            self._run,
+            "INSERT INTO state (key, value, updated_at, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+            (key, value, time.time(), _expires_at(ttl)),
+        )
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._run, "DELETE FROM state WHERE key = ?", (key,))
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._run, "DELETE FROM state WHERE expires_at <= ?", (time.time(),))
+
+    async def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+            self._conn = None
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Key/value state on a Redis-protocol server (Redis, Valkey, KeyDB, ...)
+
+    Speaks RESP directly over a small pool of asyncio connections, so no client
+    library is needed. URL format: redis://[:password@]host[:port][/db]
+    """
+
+    def __init__(self, url: str = REDIS_URL, pool_size: int = REDIS_POOL_SIZE):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self._idle = []
+        self._slots = None
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = (reader, writer)
+        try:
+            if self.password:
+                await self._call(conn, "AUTH", self.password)
+            if self.db:
+                await self._call(conn, "SELECT", str(self.db))
+        except BaseException:
+            writer.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await cls._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _call(self, conn, *args):
+        reader, writer = conn
+        writer.write(self._encode(*args))
+        await writer.drain()
+        return await self._read_reply(reader)
+
+    async def execute(self, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                reply = await self._call(conn, *args)
+            except RedisError:
+                # The error reply was read in full, so the connection is still in sync
+                self._idle.append(conn)
+                raise
+            except BaseException:
+                # Connection errors, but also cancellation (e.g. a client disconnect) between
+                # the write and the read: an unread reply would be handed to the next command
+                conn[1].close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def get(self, key: str):
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: str, ttl: int = None):
+        if ttl:
+            await self.execute("SET", key, value, "EX", ttl)
+        else:
+            await self.execute("SET", key, value)
+
+    async def delete(self, key: str):
+        await self.execute("DEL", key)
+
+    async def purge_expired(self) -> int:
+        # The server expires keys itself
+        return 0
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+def create_backend(name: str = STATE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(STATE_SQLITE_PATH)
+    if name == "redis":
+        return RedisBackend(REDIS_URL)
+    raise ValueError(f"Unknown STATE_BACKEND '{name}' (use memory, sqlite or redis)")
+
+
+_shared_backend = None
+
+
+def shared_backend():
+    """The process-wide STATE_BACKEND instance, created on first use and shared by all its users"""
+    global _shared_backend
+    if _shared_backend is None:
+        _shared_backend = create_backend()
+    return _shared_backend
+
+
+class StateStore:
+    """JSON values under a namespace of a shared backend, expiring `ttl` seconds after the last write"""
+
+    def __init__(self, namespace: str, backend, ttl: int = STATE_TTL_SECONDS):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str, default=None):
+        raw = await self.backend.get(self._key(key))
+        return default if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value):
+        await self.backend.set(self._key(key), json.dumps(value, ensure_ascii=False, separators=(",", ":")), self.ttl)
+
+    async def delete(self, key: str):
+        await self.backend.delete(self._key(key))
+
+    async def exists(self, key: str) -> bool:
+        return await self.backend.get(self._key(key)) is not None
+
+
+# --- Compact LangChain message serialization ---
+_MESSAGE_TYPES = {"s": SystemMessage, "h": HumanMessage, "a": AIMessage, "t": ToolMessage}
+_MESSAGE_CODES = {cls: code for code, cls in _MESSAGE_TYPES.items()}
+
+
+def dump_messages(messages: list) -> list:
+    """Serialize chat history to small dicts: type code, content and only the fields each type needs"""
+    dumped = []
+    for message in messages:
+        item = {"t": _MESSAGE_CODES[type(message)], "c": message.content}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            item["tc"] = [{"id": call["id"], "n": call["name"], "a": call["args"]} for call in message.tool_calls]
+        elif isinstance(message, ToolMessage):
+            item["id"] = message.tool_call_id
+        dumped.append(item)
+    return dumped
+
+
+def load_messages(items: list) -> list:
+    messages = []
+    for item in items:
+        cls = _MESSAGE_TYPES[item["t"]]
+        if cls is AIMessage:
+            tool_calls = [{"id": call["id"], "name": call["n"], "args": call["a"]} for call in item.get("tc", [])]
+            messages.append(AIMessage(content=item["c"], tool_calls=tool_calls))
+        elif cls is ToolMessage:
+            messages.append(ToolMessage(content=item["c"], tool_call_id=item["id"]))
+        else:
+            messages.append(cls(content=item["c"]))
+    return messages
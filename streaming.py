@@ -0,0 +1,64 @@
+import json
+
+from fastapi.responses import StreamingResponse
+
+from llm import parse_json_content, stream_chat_completion
+from llm_json import IncrementalObjectParser
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+}
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def stream_llm_json(conversation: list, on_complete=None, known_fields: dict = None, **llm_kwargs):
+    """Stream a JSON-producing completion as SSE
+
+    Emits `token` events for raw deltas, a `field` event for each top-level key as soon
+    as its value is complete, then a final `done` event carrying the response payload.
+    `known_fields` (already computed locally) are sent first and override the model output.
+    async `on_complete(result, truncated)` builds that payload (default: {"status": "success", "recipe": result}).
+    """
+    known_fields = known_fields or {}
+    for key, value in known_fields.items():
+        yield sse_event("field", {"field": key, "value": value})
+
+    parser = IncrementalObjectParser()
+    try:
+        async for delta in stream_chat_completion(conversation, **llm_kwargs):
+            yield sse_event("token", {"text": delta})
+            for key, value in parser.feed(delta):
+                if key not in known_fields:
+                    yield sse_event("field", {"field": key, "value": value})
+    except Exception as e:
+        yield sse_event("error", {"status": "error", "message": str(e)})
+        return
+
+    result, truncated = parse_json_content(parser.buffer)
+    if result is None and parser.fields:
+        result, truncated = dict(parser.fields), True
+    if result is None:
+        yield sse_event("error", {"status": "error", "message": "Could not parse the recipe.", "debug": {"raw_output": parser.buffer}})
+        return
+
+    if isinstance(result, dict):
+        result = {**result, **known_fields}
+    payload = await on_complete(result, truncated) if on_complete else {"status": "success", "recipe": result}
+    yield sse_event("done", payload)
+
+
+async def replay_json(result: dict, payload: dict):
+    """Emit an already-available result (e.g. a cache hit) using the same event sequence"""
+    if isinstance(result, dict):
+        for key, value in result.items():
+            yield sse_event("field", {"field": key, "value": value})
+    yield sse_event("done", payload)
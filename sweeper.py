@@ -0,0 +1,66 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from model import BreadSession, RecipeSession, engine
+from session_store import sweep_expired_sessions
+from state_store import MemoryBackend
+
+# Load environment variables
+load_dotenv()
+
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "3600"))
+# Advisory lock key: every worker runs a sweeper, but only the one holding the lock sweeps a round
+SWEEPER_LOCK_KEY = 727342
+
+
+@asynccontextmanager
+async def sweep_lock():
+    """Yields True if this worker won this round's sweep (always True on databases without advisory locks)
+
+    The lock is transaction-scoped, taken in a transaction that stays open for the whole
+    round and is released when it ends. An open transaction keeps its server backend even
+    behind a transaction-mode pooler (PgBouncer, Neon's -pooler host), where a session lock
+    could be left behind on a backend and block every later round.
+    """
+    async with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            yield True
+            return
+        async with conn.begin():
+            yield (await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SWEEPER_LOCK_KEY})).scalar()
+
+
+async def sweep_once(state_backends: list) -> dict:
+    """Remove expired bread/recipe sessions and expired conversation state"""
+    removed = {"sessions": 0, "state": 0}
+    # A memory backend belongs to this process alone, so every worker purges its own
+    for backend in state_backends:
+        if isinstance(backend, MemoryBackend):
+            removed["state"] += await backend.purge_expired()
+    async with sweep_lock() as leader:
+        if not leader:
+            return removed
+        removed["sessions"] = await sweep_expired_sessions([BreadSession, RecipeSession])
+        for backend in state_backends:
+            if not isinstance(backend, MemoryBackend):
+                removed["state"] += await backend.purge_expired()
+    return removed
+
+
+async def run_sweeper(state_backends: list, interval: int = SESSION_SWEEP_INTERVAL_SECONDS):
+    """Background task: sweep every `interval` seconds until cancelled"""
+    while True:
+        try:
+            removed = await sweep_once(state_backends)
+            if removed["sessions"] or removed["state"]:
+                print(f"[{datetime.now()}] Sweeper removed {removed['sessions']} sessions and {removed['state']} state entries")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[{datetime.now()}] Sweeper error: {e}")
+        await asyncio.sleep(interval)
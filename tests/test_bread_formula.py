@@ -0,0 +1,84 @@
+import re
+
+import pytest
+
+from bread_formula import compute_bread_formula
+
+
+def _formula(**answers):
+    base = {
+        "bread_type": "rustic",
+        "available_flours": "bread flour",
+        "experience": "intermediate",
+        "leavening": "dry yeast",
+        "fermentation_time": "12h",
+        "room_temperature": "20°C",
+        "final_amount": "1 loaf",
+    }
+    return compute_bread_formula({**base, **answers})
+
+
+def _grams(formula: dict, name: str) -> float:
+    return next(i["quantity_grams"] for i in formula["ingredients"] if i["name"] == name)
+
+
+@pytest.mark.parametrize("final_amount", ["0g", "0 kg", "0 loaves", "0 rolls (500g)", "0 loaves (0g)"])
+def test_zero_amounts_fall_back_to_a_usable_dough(final_amount):
+    formula = _formula(final_amount=final_amount)
+    total = sum(i["quantity_grams"] for i in formula["ingredients"])
+    assert total > 0
+    assert all(i["quantity_grams"] > 0 for i in formula["ingredients"])
+
+
+def test_zero_pieces_counts_as_one():
+    formula = _formula(bread_type="rolls", final_amount="0 rolls (500g)")
+    assert formula["dish"] == "Bread Rolls"
+    assert "Pre-shape, rest 20 minutes, then shape" in " ".join(formula["timeline"])
+
+
+def test_tiny_amounts_keep_salt_and_yeast():
+    formula = _formula(final_amount="5 g")
+    assert _grams(formula, "salt") > 0
+    assert _grams(formula, "dry yeast") > 0
+
+
+@pytest.mark.parametrize("leavening", ["dry yeast", "fresh yeast", "sourdough starter"])
+def test_ingredients_add_up_to_the_requested_weight(leavening):
+    formula = _formula(leavening=leavening, final_amount="750g")
+    total = sum(i["quantity_grams"] for i in formula["ingredients"])
+    assert abs(total - 750) <= 3
+
+
+def _minutes(step: str) -> float:
+    match = re.search(r"- (\d+(?:\.\d+)?) (minutes|hours?)", step)
+    value = float(match.group(1))
+    return value if match.group(2) == "minutes" else value * 60
+
+
+@pytest.mark.parametrize("fermentation_time", ["1h", "2h", "3 hours", "a few hours", "12h"])
+def test_short_schedules_fit_the_requested_time(fermentation_time):
+    formula = _formula(fermentation_time=fermentation_time)
+    hours = {"a few hours": 4}.get(fermentation_time) or float(re.match(r"\d+", fermentation_time).group())
+    bulk = next(s for s in formula["timeline"] if "Bulk fermentation" in s)
+    proof = next(s for s in formula["timeline"] if "Final proof" in s)
+    assert _minutes(bulk) + _minutes(proof) == pytest.approx(hours * 60)
+
+
+def test_one_hour_schedule_is_split_in_minutes():
+    timeline = " ".join(_formula(fermentation_time="1h")["timeline"])
+    assert "Bulk fermentation - 15 minutes" in timeline
+    assert "Final proof - 45 minutes" in timeline
+
+
+@pytest.mark.parametrize("fermentation_time", ["1h", "4h", "5h", "13h", "24h", "48h"])
+def test_durations_are_pluralised(fermentation_time):
+    timeline = " ".join(_formula(fermentation_time=fermentation_time)["timeline"])
+    assert not re.search(r"\b1 hours\b", timeline)
+    assert not re.search(r"\b(?:[02-9]|\d{2,}|\d+\.\d+) hour\b", timeline)
+
+
+def test_unitless_warm_temperature_is_fahrenheit():
+    celsius = _formula(room_temperature="24")
+    fahrenheit = _formula(room_temperature="75")
+    assert "at 24°C" in " ".join(celsius["timeline"])
+    assert "at 24°C" in " ".join(fahrenheit["timeline"])
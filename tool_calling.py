@@ -1,5 +1,4 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, SystemMessage
 import re
 from dotenv import load_dotenv
@@ -10,6 +9,8 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
+from bread_formula import flour_and_water, fresh_yeast_grams, split_fermentation
+
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
@@ -399,16 +400,11 @@ def get_hydration_response(
     number_of_pizzas: int
 ) -> str:
 
-    # Convert percentage to ratio
-    hydration_ratio = hydration_percent / 100.0
-
     # Calculate flour and water based on hydration formula:
     # total_dough = flour + water
     # water = flour * hydration
     # => flour = total_dough / (1 + hydration)
-
-    flour = round(total_dough_weight / (1 + hydration_ratio))
-    water = round(flour * hydration_ratio)
+    flour, water = flour_and_water(total_dough_weight, hydration_percent)
 
     hydration_comment = ""
     if hydration_percent == 60:
@@ -755,8 +751,7 @@ Handles the user's selected fermentation duration (in hours) and provides an opt
 def get_fermentation_time_response(fermentation_hours: int) -> str:
     """Handles fermentation time, calculates bulk/ball time, and asks kneading method."""
 
-    bulk_hours = round(fermentation_hours * 0.25)
-    ball_hours = fermentation_hours - bulk_hours
+    bulk_hours, ball_hours = split_fermentation(fermentation_hours)
 
     return f"""
 Perfect! A very smart and balanced choice — like a true pizzaiolo in the making!  
@@ -1092,13 +1087,11 @@ def get_step_by_step_start_response(
     total_dough = servings * pizza_weight
 
     # Step 2: Calculate flour and water
-    hydration_ratio = hydration_percent / 100.0
-    flour = round(total_dough / (1 + hydration_ratio))
-    water = round(flour * hydration_ratio)
+    flour, water = flour_and_water(total_dough, hydration_percent)
 
     # Step 3: Estimate salt and yeast
     salt = round(flour * 0.032)  # 3.2% gives flexibility: 2–3%
-    yeast = round((flour * 23) / (fermentation_hours * hydration_percent * room_temperature), 1)
+    yeast = fresh_yeast_grams(flour, fermentation_hours, hydration_percent, room_temperature)
 
     return f"""
     Perfect! 🧑‍🍳  